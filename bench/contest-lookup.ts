@@ -0,0 +1,66 @@
+/**
+ * 比赛查询基准测试
+ *
+ * 对比旧实现（find({ docType: 30 }).toArray() 后在 JS 中逐个比较 _id）
+ * 与 findContestDocument 使用的 ObjectId 点查询，在不同比赛数量下的延迟。
+ *
+ * 运行方式（需要可用的 MongoDB 实例，会在临时数据库中写入数据并在结束后删除）:
+ *   MONGO_URL=mongodb://localhost:27017 npx tsx bench/contest-lookup.ts
+ */
+import { MongoClient, ObjectId } from 'mongodb';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = `phosphorus_bench_${Date.now()}`;
+const SIZES = [1000, 5000, 20000, 50000];
+const LOOKUPS = 200;
+const LEGACY_LOOKUPS = 20;
+
+async function timeIt(times: number, fn: () => Promise<unknown>): Promise<number> {
+    const start = process.hrtime.bigint();
+    for (let i = 0; i < times; i++) {
+        await fn();
+    }
+    return Number(process.hrtime.bigint() - start) / 1e6 / times;
+}
+
+async function main() {
+    const client = await MongoClient.connect(MONGO_URL);
+    const coll = client.db(DB_NAME).collection('document');
+    await coll.createIndex({ domainId: 1, docType: 1, docId: 1 }, { unique: true });
+
+    const ids: ObjectId[] = [];
+    console.log('contests\tlegacy_scan_ms\tindexed_ms');
+    try {
+        for (const size of SIZES) {
+            const batch: any[] = [];
+            while (ids.length < size) {
+                const _id = new ObjectId();
+                ids.push(_id);
+                batch.push({
+                    _id, docId: _id, domainId: 'system', docType: 30,
+                    title: `Contest ${ids.length}`, content: 'x'.repeat(512), pids: [1000, 1001, 1002],
+                });
+            }
+            if (batch.length) await coll.insertMany(batch);
+
+            const pick = () => ids[Math.floor(Math.random() * ids.length)].toHexString();
+
+            const legacy = await timeIt(LEGACY_LOOKUPS, async () => {
+                const target = pick();
+                const all = await coll.find({ docType: 30 }).toArray();
+                return all.find((doc) => doc._id.toString() === target);
+            });
+            const indexed = await timeIt(LOOKUPS, () => coll.findOne({ _id: new ObjectId(pick()), docType: 30 }));
+
+            console.log(`${size}\t${legacy.toFixed(2)}\t${indexed.toFixed(3)}`);
+        }
+    } finally {
+        await client.db(DB_NAME).dropDatabase();
+        await client.close();
+    }
+}
+
+main().catch((error) => {
+    console.error(error);
+    process.exit(1);
+});
@@ -1,20 +1,621 @@
 // @noErrors
 // @module: esnext
 // @filename: index.ts
+import { createHash } from 'crypto';
+import fs from 'fs';
+import http from 'http';
+import https from 'https';
+import path from 'path';
+import { PassThrough, Readable, Stream } from 'stream';
 import {
     Context, definePlugin, Handler, NotFoundError,
-    PRIV, SystemModel, db
+    ObjectId, PRIV, STATUS, SystemModel, db
 } from 'hydrooj';
+import {
+    compressBuffer, createEncoder, decodeBody,
+    isCompressibleType, negotiateEncoding, UPSTREAM_ACCEPT_ENCODING
+} from './lib/compression';
+import { StructuredLogger } from './lib/logger';
+import {
+    buildClusters, mergePairs, mergeResultStats, rejudgedLanguages, submissionKeys
+} from './lib/incremental';
+import { computePairStats } from './lib/pair-stats';
+import { loadSettings, PluginSettings, SYSTEM_SETTING_KEYS } from './lib/settings';
 
 // Plugin configuration
 const PLUGIN_NAME = 'phosphorus-plagiarism';
 const PLUGIN_VERSION = '2.0.0'; // Updated for enhanced features
 
-// Get Phosphorus API base URL from system settings
+// Hydro document types
+const DOC_TYPE_PROBLEM = 10;
+const DOC_TYPE_CONTEST = 30;
+
+// 插件日志，输出级别与 payload 日志由 applySettings() 按插件设置配置
+const logger = new StructuredLogger('phosphorus');
+const enhancedLogger = new StructuredLogger('phosphorus.enhanced');
+
+// config.json 只在插件加载时读取一次
+let fileConfig: any = null;
+
+// 当前生效的插件设置，请求路径只读取内存中的这份对象
+let settings: PluginSettings = loadSettings(null, () => undefined);
+
+function readFileConfig(): any {
+    try {
+        return JSON.parse(fs.readFileSync(path.join(__dirname, 'config.json'), 'utf8'));
+    } catch (error: any) {
+        logger.warn('Failed to read config.json, using defaults', error);
+        return null;
+    }
+}
+
+/**
+ * 从 config.json 与系统设置重新加载插件设置，并同步到日志与连接池
+ */
+function refreshSettings() {
+    const previous = settings;
+    settings = loadSettings(fileConfig, (key) => SystemModel.get(key));
+    
+    const logOptions = {
+        level: settings.log.level,
+        payloads: settings.log.payloads,
+        sampleRate: settings.log.sample_rate,
+        maxPayloadChars: settings.log.max_payload
+    };
+    logger.configure(logOptions);
+    enhancedLogger.configure(logOptions);
+    
+    // 连接池参数变化时重建连接池，旧连接在空闲超时后自行关闭
+    if (previous.http.max_sockets !== settings.http.max_sockets || previous.http.idle_timeout !== settings.http.idle_timeout) {
+        httpAgents = null;
+    }
+}
+
+// Get Phosphorus API base URL from plugin settings
 function getPhosphorusApiBase(): string {
-    const apiBase = SystemModel.get('phosphorus.api.base') || 'http://localhost:8000';
-    console.log('[Phosphorus Plugin] API Base URL:', apiBase);
-    return apiBase;
+    return settings.api.base_url;
+}
+
+/**
+ * 共享的比赛文档解析器
+ *
+ * 将24位十六进制字符串转换为 ObjectId 后直接命中 _id / (domainId, docType, docId) 索引，
+ * 最多两次点查询，不会把 docType=30 的全部文档加载到内存中。
+ */
+async function findContestDocument(contestId: string, domainId?: string, projection?: Record<string, 0 | 1>): Promise<any | null> {
+    if (!contestId || !/^[0-9a-fA-F]{24}$/.test(contestId.toString())) {
+        return null;
+    }
+    const oid = new ObjectId(contestId.toString());
+    const options = projection ? { projection } : {};
+    const documentColl = db.collection('document') as any;
+
+    // Hydro 中比赛文档的 _id 与 docId 相同，优先走主键索引
+    const byId = await documentColl.findOne({ _id: oid, docType: DOC_TYPE_CONTEST }, options);
+    if (byId || !domainId) {
+        return byId;
+    }
+    return await documentColl.findOne({ domainId, docType: DOC_TYPE_CONTEST, docId: oid }, options);
+}
+
+/**
+ * 批量解析比赛文档：一次 $in 查询取回所有比赛，返回以十六进制ID为键的 Map
+ */
+async function findContestDocuments(contestIds: Iterable<string>, projection?: Record<string, 0 | 1>): Promise<Map<string, any>> {
+    const oids: ObjectId[] = [];
+    for (const contestId of new Set(Array.from(contestIds, (id) => id?.toString()))) {
+        if (contestId && /^[0-9a-fA-F]{24}$/.test(contestId)) {
+            oids.push(new ObjectId(contestId));
+        }
+    }
+
+    const contests = new Map<string, any>();
+    if (oids.length === 0) {
+        return contests;
+    }
+
+    const options = projection ? { projection } : {};
+    const docs = await (db.collection('document') as any).find({
+        _id: { $in: oids },
+        docType: DOC_TYPE_CONTEST
+    }, options).toArray();
+    for (const doc of docs) {
+        contests.set(doc._id.toHexString(), doc);
+    }
+    return contests;
+}
+
+/**
+ * 批量获取题目标题：数字ID按 docId、字符串ID按 pid，在同一次 $in 查询中解析，
+ * 返回以 String(题目ID) 为键的标题 Map
+ */
+async function findProblemTitles(problemIds: Iterable<any>, domainId?: string): Promise<Map<string, string>> {
+    const docIds = new Set<number>();
+    const pids = new Set<string>();
+    for (const problemId of problemIds) {
+        if (problemId === null || problemId === undefined || problemId === '') {
+            continue;
+        }
+        const key = String(problemId);
+        pids.add(key);
+        if (/^\d+$/.test(key)) {
+            docIds.add(parseInt(key));
+        }
+    }
+
+    const titles = new Map<string, string>();
+    if (pids.size === 0) {
+        return titles;
+    }
+
+    const query: any = {
+        docType: DOC_TYPE_PROBLEM,
+        $or: [
+            { docId: { $in: Array.from(docIds) } },
+            { pid: { $in: Array.from(pids) } }
+        ]
+    };
+    if (domainId) {
+        query.domainId = domainId;
+    }
+    const docs = await db.collection('document').find(query, {
+        projection: { docId: 1, pid: 1, title: 1 }
+    } as any).toArray();
+    for (const doc of docs as any[]) {
+        if (!doc.title) {
+            continue;
+        }
+        // docId 命中优先于 pid 命中
+        if (doc.pid && pids.has(doc.pid) && !titles.has(doc.pid)) {
+            titles.set(doc.pid, doc.title);
+        }
+        if (docIds.has(doc.docId)) {
+            titles.set(String(doc.docId), doc.title);
+        }
+    }
+    return titles;
+}
+
+/**
+ * 插件查询依赖的索引
+ */
+const PLUGIN_INDEXES: { collection: string; key: Record<string, 1 | -1>; name: string; unique?: boolean }[] = [
+    // 比赛概览 / 题目最新结果 (contest_id, problem_id) + created_at 倒序
+    { collection: 'check_plagiarism_results', key: { contest_id: 1, problem_id: 1, created_at: -1 }, name: 'contest_problem_created' },
+    // 按分析ID查询
+    { collection: 'check_plagiarism_results', key: { analysis_id: 1 }, name: 'analysis_id' },
+    // 比赛列表页的条件请求校验值（全局最新结果）与比赛概览的增量刷新
+    { collection: 'check_plagiarism_results', key: { created_at: -1 }, name: 'created_at' },
+    // 比赛列表的键集分页
+    { collection: 'plagiarism_contest_summaries', key: { last_check_at: -1, contest_id: -1 }, name: 'last_check_contest' },
+    // 每次分析的摘要文档
+    { collection: 'plagiarism_summaries', key: { analysis_id: 1 }, name: 'analysis_id', unique: true },
+    // 按 pid 查询题目标题（不带 domainId，Hydro 自带索引无法覆盖）
+    { collection: 'document', key: { docType: 1, pid: 1 }, name: 'phosphorus_problem_pid' },
+    // 查重任务队列：按状态取下一个任务 / 统计排队位置
+    { collection: 'plagiarism_queue', key: { status: 1, priority: 1, created_at: 1 }, name: 'status_priority_created' },
+    // 批量任务进度汇总
+    { collection: 'plagiarism_queue', key: { batch_id: 1 }, name: 'batch_id' }
+];
+
+/**
+ * 启动检查使用的代表性查询，用于判断哪些查询会退化为全表扫描
+ */
+const INDEX_PROBES: { name: string; collection: string; filter: Record<string, any>; sort?: Record<string, 1 | -1> }[] = [
+    { name: 'results_by_contest', collection: 'check_plagiarism_results', filter: { contest_id: '' } },
+    {
+        name: 'latest_result_by_problem',
+        collection: 'check_plagiarism_results',
+        filter: { contest_id: '', problem_id: 0 },
+        sort: { created_at: -1 }
+    },
+    { name: 'result_by_analysis_id', collection: 'check_plagiarism_results', filter: { analysis_id: '' } },
+    { name: 'summary_by_analysis_id', collection: 'plagiarism_summaries', filter: { analysis_id: '' } },
+    {
+        name: 'contest_list_page',
+        collection: 'plagiarism_contest_summaries',
+        filter: { last_check_at: { $lt: new Date() } },
+        sort: { last_check_at: -1, contest_id: -1 }
+    },
+    { name: 'problem_by_pid', collection: 'document', filter: { docType: DOC_TYPE_PROBLEM, pid: '' } },
+    { name: 'queue_next_job', collection: 'plagiarism_queue', filter: { status: 'queued' }, sort: { priority: 1, created_at: 1 } },
+    {
+        name: 'changed_records_by_problem',
+        collection: 'record',
+        filter: {
+            domainId: 'system',
+            contest: new ObjectId(),
+            pid: 0,
+            $or: [{ _id: { $gt: new ObjectId() } }, { judgeAt: { $gt: new Date(0) } }]
+        }
+    }
+];
+
+interface IndexReport {
+    indexes: { collection: string; name: string; present: boolean }[];
+    collection_scans: string[];
+    checked_at: Date;
+}
+
+// 最近一次索引检查的结果，由运行指标接口展示
+let indexReport: IndexReport | null = null;
+
+function planUsesCollectionScan(plan: any): boolean {
+    if (!plan || typeof plan !== 'object') {
+        return false;
+    }
+    if (plan.stage === 'COLLSCAN') {
+        return true;
+    }
+    const children = [plan.inputStage, plan.queryPlan, ...(plan.inputStages || [])];
+    return children.some((child) => planUsesCollectionScan(child));
+}
+
+/**
+ * 幂等地创建插件索引，并通过 explain 检查代表性查询是否命中索引
+ */
+async function bootstrapIndexes(): Promise<IndexReport> {
+    const report: IndexReport = { indexes: [], collection_scans: [], checked_at: new Date() };
+    
+    for (const spec of PLUGIN_INDEXES) {
+        const coll = (db as any).collection(spec.collection);
+        try {
+            await db.ensureIndexes(coll, { key: spec.key, name: spec.name, ...(spec.unique ? { unique: true } : {}) });
+        } catch (error) {
+            logger.warn(`Failed to ensure index ${spec.collection}.${spec.name}`, error);
+        }
+        const existing = await coll.indexes().catch(() => []);
+        const present = existing.some((index: any) => index.name === spec.name);
+        report.indexes.push({ collection: spec.collection, name: spec.name, present });
+        logger.debug(`Index ${spec.collection}.${spec.name}: ${present ? 'ok' : 'missing'}`);
+    }
+    
+    for (const probe of INDEX_PROBES) {
+        try {
+            const cursor = (db as any).collection(probe.collection).find(probe.filter);
+            if (probe.sort) {
+                cursor.sort(probe.sort);
+            }
+            const explain = await cursor.explain('queryPlanner');
+            if (planUsesCollectionScan(explain?.queryPlanner?.winningPlan)) {
+                report.collection_scans.push(probe.name);
+            }
+        } catch (error) {
+            logger.warn(`Failed to explain query ${probe.name}`, error);
+        }
+    }
+    
+    const missing = report.indexes.filter((index) => !index.present).map((index) => `${index.collection}.${index.name}`);
+    if (missing.length > 0) {
+        logger.warn(`Missing plugin indexes: ${missing.join(', ')}`);
+    }
+    if (report.collection_scans.length > 0) {
+        logger.warn(`Queries falling back to collection scans: ${report.collection_scans.join(', ')}`);
+    } else {
+        logger.info('All plugin queries are covered by indexes');
+    }
+    
+    return report;
+}
+
+interface PhosphorusResponse {
+    ok: boolean;
+    status: number;
+    statusText: string;
+    headers: http.IncomingHttpHeaders;
+    bytes: number;
+    text(): Promise<string>;
+    json(): Promise<any>;
+}
+
+// 连接复用统计，用于观察 keep-alive 带来的延迟收益
+const httpClientStats = {
+    requests: 0,
+    new_connections: 0,
+    reused_connections: 0,
+    coalesced_requests: 0,
+    errors: 0,
+    // 上游响应的传输字节数与解压后字节数
+    bytes_received: 0,
+    bytes_decoded: 0
+};
+
+let httpAgents: { http: http.Agent; https: https.Agent } | null = null;
+
+/**
+ * 所有 Phosphorus API 调用共享的 keep-alive 连接池。
+ * 最大连接数与空闲超时取自 settings.http，设置变化后下一次请求时重建。
+ */
+function getHttpAgents(): { http: http.Agent; https: https.Agent } {
+    if (!httpAgents) {
+        const options = {
+            keepAlive: true,
+            maxSockets: settings.http.max_sockets,
+            // 空闲连接超过该时间后由连接池关闭
+            timeout: settings.http.idle_timeout
+        };
+        httpAgents = { http: new http.Agent(options), https: new https.Agent(options) };
+    }
+    return httpAgents;
+}
+
+/**
+ * 通过共享连接池发送请求，返回未读取的上游响应流（调用方负责消费或销毁）
+ */
+function openPhosphorusStream(url: string, options: { method?: string; headers?: Record<string, string>; body?: string } = {}): Promise<http.IncomingMessage> {
+    const target = new URL(url);
+    const isHttps = target.protocol === 'https:';
+    const agents = getHttpAgents();
+    
+    return new Promise((resolve, reject) => {
+        httpClientStats.requests++;
+        const req = (isHttps ? https : http).request(target, {
+            method: options.method || 'GET',
+            headers: options.headers,
+            agent: isHttps ? agents.https : agents.http
+        }, resolve);
+        
+        req.on('socket', () => {
+            if (req.reusedSocket) {
+                httpClientStats.reused_connections++;
+            } else {
+                httpClientStats.new_connections++;
+            }
+        });
+        const timeout = settings.api.timeout;
+        req.setTimeout(timeout, () => {
+            req.destroy(new Error(`Request timed out after ${timeout}ms`));
+        });
+        req.on('error', (error) => {
+            httpClientStats.errors++;
+            reject(error);
+        });
+        
+        if (options.body) {
+            req.write(options.body);
+        }
+        req.end();
+    });
+}
+
+/**
+ * 通过共享连接池发送请求，返回与 fetch 相同用法的响应对象。
+ * 默认向上游声明支持 br/gzip/deflate，并透明解压响应体。
+ */
+async function phosphorusFetch(url: string, options: { method?: string; headers?: Record<string, string>; body?: string } = {}): Promise<PhosphorusResponse> {
+    const res = await openPhosphorusStream(url, {
+        ...options,
+        headers: { 'Accept-Encoding': UPSTREAM_ACCEPT_ENCODING, ...options.headers }
+    });
+    const chunks: Buffer[] = [];
+    for await (const chunk of res) {
+        chunks.push(chunk as Buffer);
+    }
+    const raw = Buffer.concat(chunks);
+    const body = await decodeBody(raw, res.headers['content-encoding'] as string | undefined);
+    httpClientStats.bytes_received += raw.length;
+    httpClientStats.bytes_decoded += body.length;
+    const text = body.toString('utf8');
+    const status = res.statusCode || 0;
+    return {
+        ok: status >= 200 && status < 300,
+        status,
+        statusText: res.statusMessage || '',
+        headers: res.headers,
+        bytes: body.length,
+        text: async () => text,
+        json: async () => JSON.parse(text)
+    };
+}
+
+// 正在进行中的 GET 请求，相同请求合并为一次上游调用
+const inflightRequests = new Map<string, Promise<any>>();
+
+/**
+ * Single-flight：同一时刻相同 key 的请求只发起一次，其余调用方共享同一个 Promise。
+ * 调用方应将返回结果视为只读。
+ */
+function singleFlight<T>(key: string, fn: () => Promise<T>): Promise<T> {
+    const pending = inflightRequests.get(key);
+    if (pending) {
+        httpClientStats.coalesced_requests++;
+        return pending;
+    }
+    const promise = fn().finally(() => {
+        inflightRequests.delete(key);
+    });
+    inflightRequests.set(key, promise);
+    return promise;
+}
+
+// 只读接口的缓存时间（毫秒），按顺序匹配，未匹配的接口不缓存
+const RESPONSE_CACHE_TTLS: { pattern: RegExp; ttl: number }[] = [
+    { pattern: /^\/api\/v1\/contests\/plagiarism(\?|$)/, ttl: 60 * 1000 },
+    { pattern: /^\/api\/v1\/jplag\/enhanced\/problem\//, ttl: 5 * 60 * 1000 },
+    { pattern: /^\/api\/v1\/jplag\/enhanced\//, ttl: 2 * 60 * 1000 }
+];
+const RESPONSE_CACHE_MAX_ENTRIES = 500;
+const RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024;
+
+/**
+ * 进程内 TTL + LRU 响应缓存，同时限制条目数与总字节数。
+ * Map 的插入顺序即为最近使用顺序，命中时重新插入到末尾。
+ */
+class ResponseCache {
+    private entries = new Map<string, { value: any; bytes: number; expiresAt: number }>();
+    private totalBytes = 0;
+    stats = { hits: 0, misses: 0, evictions: 0, invalidations: 0 };
+
+    constructor(private maxEntries: number, private maxBytes: number) {}
+
+    ttlFor(endpoint: string): number {
+        return RESPONSE_CACHE_TTLS.find((rule) => rule.pattern.test(endpoint))?.ttl || 0;
+    }
+
+    get(key: string): any {
+        const entry = this.entries.get(key);
+        if (!entry || entry.expiresAt <= Date.now()) {
+            if (entry) {
+                this.delete(key);
+            }
+            this.stats.misses++;
+            return undefined;
+        }
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        this.stats.hits++;
+        return entry.value;
+    }
+
+    set(key: string, value: any, bytes: number, ttl: number) {
+        if (bytes > this.maxBytes) {
+            return;
+        }
+        this.delete(key);
+        this.entries.set(key, { value, bytes, expiresAt: Date.now() + ttl });
+        this.totalBytes += bytes;
+        for (const oldest of this.entries.keys()) {
+            if (this.entries.size <= this.maxEntries && this.totalBytes <= this.maxBytes) {
+                break;
+            }
+            this.delete(oldest);
+            this.stats.evictions++;
+        }
+    }
+
+    delete(key: string) {
+        const entry = this.entries.get(key);
+        if (entry) {
+            this.totalBytes -= entry.bytes;
+            this.entries.delete(key);
+        }
+    }
+
+    invalidate(predicate: (key: string) => boolean) {
+        for (const key of Array.from(this.entries.keys())) {
+            if (predicate(key)) {
+                this.delete(key);
+                this.stats.invalidations++;
+            }
+        }
+    }
+
+    getStats() {
+        const lookups = this.stats.hits + this.stats.misses;
+        return {
+            ...this.stats,
+            hit_ratio: lookups > 0 ? this.stats.hits / lookups : 0,
+            entries: this.entries.size,
+            bytes: this.totalBytes
+        };
+    }
+}
+
+const responseCache = new ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES);
+
+/**
+ * 递归冻结解析后的 JSON 数据（每次上游响应只执行一次）
+ */
+function deepFreeze<T>(value: T): T {
+    const stack: any[] = [value];
+    while (stack.length > 0) {
+        const item = stack.pop();
+        if (item === null || typeof item !== 'object' || Object.isFrozen(item)) {
+            continue;
+        }
+        Object.freeze(item);
+        for (const key of Object.keys(item)) {
+            stack.push(item[key]);
+        }
+    }
+    return value;
+}
+
+/**
+ * 带缓存的 GET：先查缓存，未命中时通过 single-flight 请求上游并写入缓存。
+ * 返回值由缓存命中方与并发调用方共享，因此会被深度冻结，调用方需要修改时应先复制。
+ */
+async function cachedGet(key: string, endpoint: string, load: () => Promise<{ data: any; bytes: number }>): Promise<any> {
+    const ttl = responseCache.ttlFor(endpoint);
+    if (ttl > 0) {
+        const cached = responseCache.get(key);
+        if (cached !== undefined) {
+            return cached;
+        }
+    }
+    return singleFlight(key, async () => {
+        const { data, bytes } = await load();
+        deepFreeze(data);
+        if (ttl > 0) {
+            responseCache.set(key, data, bytes, ttl);
+        }
+        return data;
+    });
+}
+
+/**
+ * 分析任务完成后使相关缓存失效：比赛列表以及包含该比赛ID的接口
+ */
+function invalidateResponseCache(contestId?: string) {
+    responseCache.invalidate((key) => key.includes('/api/v1/contests/plagiarism')
+        || !contestId || key.includes(`/${contestId}`));
+}
+
+/**
+ * 取匹配条件下最新一条查重结果的 analysis_id / created_at，作为条件请求的校验值
+ */
+async function getResultValidator(match: Record<string, any>): Promise<string> {
+    const latest = await (db as any).collection('check_plagiarism_results').findOne(match, {
+        sort: { created_at: -1 },
+        projection: { _id: 0, analysis_id: 1, created_at: 1, merged_at: 1 }
+    });
+    if (!latest) {
+        return 'empty';
+    }
+    // 增量合并原地更新结果，merged_at 随之变化
+    const time = (value: any) => value ? new Date(value).getTime() : '';
+    return `${latest.analysis_id}:${time(latest.created_at)}:${time(latest.merged_at)}`;
+}
+
+// 页面展示的比赛字段，参与条件请求的校验值
+const CONTEST_VALIDATOR_PROJECTION = { title: 1, content: 1, beginAt: 1, endAt: 1, pids: 1 } as const;
+
+/**
+ * 比赛文档展示字段的哈希，作为比赛文档的更新标记：编辑比赛标题、时间或题目后校验值随之变化
+ */
+function contestDocumentsValidator(contestDocs: Map<string, any>): string {
+    const hash = createHash('sha1');
+    for (const contestId of Array.from(contestDocs.keys()).sort()) {
+        const doc = contestDocs.get(contestId);
+        hash.update(JSON.stringify([contestId, doc.title, doc.content, doc.beginAt, doc.endAt, doc.pids]));
+    }
+    return hash.digest('base64url');
+}
+
+async function getContestValidator(contestId: string): Promise<string> {
+    return contestDocumentsValidator(await findContestDocuments([contestId], CONTEST_VALIDATOR_PROJECTION));
+}
+
+/**
+ * 条件 GET：根据校验值生成 ETag，若与 If-None-Match 匹配则直接返回 304。
+ * 页面包含当前用户信息，因此校验值中带上用户ID；查询参数（分页、筛选）同样计入。
+ */
+function respondNotModified(handler: Handler, validator: string): boolean {
+    const query = new URLSearchParams(handler.request.query as any).toString();
+    const digest = createHash('sha1')
+        .update(`${PLUGIN_VERSION}|${handler.user?._id}|${handler.request.path}?${query}|${validator}`)
+        .digest('base64url');
+    const etag = `W/"${digest}"`;
+    handler.response.addHeader('ETag', etag);
+    handler.response.addHeader('Cache-Control', 'private, no-cache');
+    
+    const ifNoneMatch = handler.request.headers['if-none-match'];
+    if (ifNoneMatch && ifNoneMatch.split(',').some((tag: string) => tag.trim() === etag)) {
+        handler.response.status = 304;
+        handler.response.body = null;
+        return true;
+    }
+    return false;
 }
 
 /**
@@ -24,9 +625,16 @@ async function makeEnhancedApiRequest(endpoint: string, method: string = 'GET',
     const apiBase = getPhosphorusApiBase();
     const url = `${apiBase}${endpoint}`;
     
-    console.log(`[Enhanced Phosphorus] Making API request: ${method} ${url}`);
+    if (method === 'GET') {
+        return cachedGet(`enhanced GET ${url}`, endpoint, () => sendEnhancedApiRequest(url, method, data));
+    }
+    return (await sendEnhancedApiRequest(url, method, data)).data;
+}
+
+async function sendEnhancedApiRequest(url: string, method: string, data?: any): Promise<{ data: any; bytes: number }> {
+    enhancedLogger.debug(`Making API request: ${method} ${url}`);
     
-    const options: RequestInit = {
+    const options: { method: string; headers: Record<string, string>; body?: string } = {
         method,
         headers: {
             'Content-Type': 'application/json',
@@ -37,24 +645,24 @@ async function makeEnhancedApiRequest(endpoint: string, method: string = 'GET',
     
     if (data && method !== 'GET') {
         options.body = JSON.stringify(data);
-        console.log(`[Enhanced Phosphorus] Request body:`, data);
+        enhancedLogger.payload('Request body', data, { url });
     }
     
     try {
-        const response = await fetch(url, options);
-        console.log(`[Enhanced Phosphorus] Response status: ${response.status} ${response.statusText}`);
+        const response = await phosphorusFetch(url, options);
+        enhancedLogger.debug(`Response status: ${response.status} ${response.statusText}`);
         
         if (!response.ok) {
             const errorData = await response.json().catch(() => ({ error: 'Unknown error' }));
-            console.error(`[Enhanced Phosphorus] Error response:`, errorData);
+            enhancedLogger.error(`Error response`, { errorData });
             throw new Error(`HTTP ${response.status}: ${errorData.detail || response.statusText}`);
         }
         
         const result = await response.json();
-        console.log(`[Enhanced Phosphorus] Response data:`, result);
-        return result;
+        enhancedLogger.payload('Response data', result, { url });
+        return { data: result, bytes: response.bytes };
     } catch (error: any) {
-        console.error(`[Enhanced Phosphorus] API request failed:`, error);
+        enhancedLogger.error(`API request failed`, error);
         throw new Error(`Enhanced API request failed: ${error.message}`);
     }
 }
@@ -69,9 +677,16 @@ async function makeApiRequest(endpoint: string, method: string = 'GET', data?: a
     const apiBase = getPhosphorusApiBase();
     const url = `${apiBase}${endpoint}`;
     
-    console.log(`[Phosphorus] Making API request: ${method} ${url}`);
+    if (method === 'GET') {
+        return cachedGet(`GET ${url}`, endpoint, () => sendApiRequest(url, method, data));
+    }
+    return (await sendApiRequest(url, method, data)).data;
+}
+
+async function sendApiRequest(url: string, method: string, data?: any): Promise<{ data: any; bytes: number }> {
+    logger.debug(`Making API request: ${method} ${url}`);
     
-    const options: RequestInit = {
+    const options: { method: string; headers: Record<string, string>; body?: string } = {
         method,
         headers: {
             'Content-Type': 'application/json',
@@ -82,23 +697,23 @@ async function makeApiRequest(endpoint: string, method: string = 'GET', data?: a
     
     if (data && method !== 'GET') {
         options.body = JSON.stringify(data);
-        console.log(`[Phosphorus] Request body:`, data);
+        logger.payload('Request body', data, { url });
     }
     
     // 重试机制
-    const maxRetries = 3;
+    const maxRetries = settings.api.retry_attempts;
     for (let attempt = 1; attempt <= maxRetries; attempt++) {
         try {
-            const response = await fetch(url, options);
-            console.log(`[Phosphorus] Response status: ${response.status} ${response.statusText}`);
+            const response = await phosphorusFetch(url, options);
+            logger.debug(`Response status: ${response.status} ${response.statusText}`);
             
             if (!response.ok) {
                 const errorText = await response.text();
-                console.error(`[Phosphorus] Error response (attempt ${attempt}):`, errorText);
+                logger.error(`Error response (attempt ${attempt})`, { status: response.status, body: errorText.slice(0, 512) });
                 
                 // 如果是5xx错误且还有重试次数，继续重试
                 if (response.status >= 500 && attempt < maxRetries) {
-                    console.log(`[Phosphorus] Retrying request (attempt ${attempt + 1}/${maxRetries})`);
+                    logger.debug(`Retrying request (attempt ${attempt + 1}/${maxRetries})`);
                     await new Promise(resolve => setTimeout(resolve, 1000 * attempt)); // 递增延迟
                     continue;
                 }
@@ -107,16 +722,16 @@ async function makeApiRequest(endpoint: string, method: string = 'GET', data?: a
             }
             
             const result = await response.json();
-            console.log(`[Phosphorus] Response data received successfully`);
-            return result;
+            logger.debug(`Response data received successfully`);
+            return { data: result, bytes: response.bytes };
             
         } catch (error: any) {
             if (attempt === maxRetries) {
-                console.error(`[Phosphorus] API request failed after ${maxRetries} attempts:`, error);
+                logger.error(`API request failed after ${maxRetries} attempts`, error);
                 throw new Error(`API请求失败: ${error.message}`);
             }
             
-            console.warn(`[Phosphorus] Request attempt ${attempt} failed, retrying...`, error.message);
+            logger.warn(`Request attempt ${attempt} failed, retrying...`, { error: error.message });
             await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
         }
     }
@@ -131,13 +746,12 @@ class PlagiarismMainHandler extends Handler {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
         try {
-            console.log('[Phosphorus] 重构版主页处理器开始执行');
+            logger.debug('重构版主页处理器开始执行');
             
             // 并行获取数据以提升性能
-            const [stats, recentActivities, systemHealth] = await Promise.all([
+            const [stats, recentActivities] = await Promise.all([
                 this.getEnhancedSystemStats(),
-                this.getRecentActivities(),
-                this.getSystemHealth()
+                this.getRecentActivities()
             ]);
             
             this.response.template = 'plagiarism_main.html';
@@ -153,21 +767,15 @@ class PlagiarismMainHandler extends Handler {
                 language_stats: stats.language_stats || {},
                 history_stats: stats.history_stats || {},
                 
-                // 系统状态
-                system_health: systemHealth,
-                
                 // 最近活动
                 recent_activities: recentActivities,
                 
                 // 元数据
                 plugin_version: PLUGIN_VERSION,
-                last_updated: new Date().toISOString(),
-                
-                // 用户友好的展示数据
-                formatted_stats: this.formatStatsForDisplay(stats)
+                last_updated: new Date().toISOString()
             };
         } catch (error: any) {
-            console.error('[Phosphorus] 主页处理器执行失败:', error);
+            logger.error('主页处理器执行失败', error);
             this.response.template = 'plagiarism_main.html';
             this.response.body = {
                 error: `加载失败: ${error.message}`,
@@ -179,8 +787,7 @@ class PlagiarismMainHandler extends Handler {
                 language_stats: {},
                 history_stats: {},
                 recent_activities: [],
-                plugin_version: PLUGIN_VERSION,
-                system_health: { status: 'error', message: error.message }
+                plugin_version: PLUGIN_VERSION
             };
         }
     }
@@ -216,7 +823,7 @@ class PlagiarismMainHandler extends Handler {
                 };
             }
         } catch (error) {
-            console.error('Failed to get system stats:', error);
+            logger.error('Failed to get system stats', error);
         }
         
         return {
@@ -252,7 +859,7 @@ class PlagiarismMainHandler extends Handler {
                 return activities;
             }
         } catch (error) {
-            console.error('Failed to get recent activities:', error);
+            logger.error('Failed to get recent activities', error);
         }
         
         return [];
@@ -296,6 +903,158 @@ class PlagiarismMainHandler extends Handler {
     }
 }
 
+// 按比赛物化的查重概览（已查题目与最后检查时间），比赛列表直接在其上分页
+const CONTEST_SUMMARY_COLLECTION = 'plagiarism_contest_summaries';
+
+function contestSummaryCollection() {
+    return (db as any).collection(CONTEST_SUMMARY_COLLECTION);
+}
+
+// 概览的输出字段
+const CONTEST_SUMMARY_OUTPUT = {
+    $project: {
+        _id: 0,
+        contest_id: 1,
+        checked_problems: { $size: { $ifNull: ['$problem_ids', []] } },
+        last_check_at: 1
+    }
+};
+
+/**
+ * 按比赛聚合查重结果的管道：输出 contest_id、已查题目(去重)与最后检查时间。
+ * 结果的 created_at 可能以字符串保存，统一转换为日期，保证与分页游标的比较类型一致。
+ */
+function contestSummaryPipeline(match: Record<string, any>): any[] {
+    return [
+        { $match: match },
+        {
+            $group: {
+                _id: '$contest_id',
+                problem_ids: { $addToSet: '$problem_id' },
+                last_check_at: {
+                    $max: { $convert: { input: '$created_at', to: 'date', onError: null, onNull: null } }
+                }
+            }
+        },
+        { $addFields: { contest_id: '$_id' } }
+    ];
+}
+
+async function aggregateContestSummaries(collection: any, match: Record<string, any> = {}): Promise<any[]> {
+    return await collection.aggregate([
+        ...contestSummaryPipeline(match),
+        { $sort: { last_check_at: -1, contest_id: -1 } },
+        CONTEST_SUMMARY_OUTPUT
+    ]).toArray();
+}
+
+// 上次刷新比赛概览时全局最新结果的校验值，未变化时没有新结果需要合并
+let contestSummariesValidator: string | null = null;
+
+// 增量刷新概览时向前多取的时间，覆盖写入时间与 created_at 之间的微小偏差
+const CONTEST_SUMMARY_REFRESH_OVERLAP_MS = 60 * 1000;
+
+/**
+ * 把上次刷新之后写入的查重结果合并进比赛概览。
+ * 只聚合 created_at 不早于概览中最新检查时间的结果（由 created_at 索引支持），
+ * 合并使用 $addToSet / $max，重复合并同一结果不会改变概览。
+ */
+async function refreshContestSummaries() {
+    const summaries = contestSummaryCollection();
+    const [latest] = await summaries.find({ last_check_at: { $ne: null } }, { projection: { last_check_at: 1 } })
+        .sort({ last_check_at: -1, contest_id: -1 }).limit(1).toArray();
+    
+    let match: Record<string, any> = {};
+    if (latest?.last_check_at) {
+        const since = new Date(new Date(latest.last_check_at).getTime() - CONTEST_SUMMARY_REFRESH_OVERLAP_MS);
+        // 以 ISO 字符串保存的 created_at 按字典序比较
+        match = { $or: [{ created_at: { $gte: since } }, { created_at: { $gte: since.toISOString() } }] };
+    }
+    
+    const operations: any[] = [];
+    for await (const row of (db as any).collection('check_plagiarism_results').aggregate(contestSummaryPipeline(match))) {
+        operations.push({
+            updateOne: {
+                filter: { _id: row.contest_id },
+                update: {
+                    $set: { contest_id: row.contest_id },
+                    $addToSet: { problem_ids: { $each: row.problem_ids } },
+                    ...(row.last_check_at ? { $max: { last_check_at: row.last_check_at } } : { $setOnInsert: { last_check_at: null } })
+                },
+                upsert: true
+            }
+        });
+    }
+    if (operations.length > 0) {
+        await summaries.bulkWrite(operations, { ordered: false });
+    }
+}
+
+// 比赛列表分页：默认每页数量与上限，可通过 page_size 查询参数调整
+const CONTEST_LIST_PAGE_SIZE = 20;
+const CONTEST_LIST_MAX_PAGE_SIZE = 100;
+
+function encodeContestListCursor(row: any): string {
+    const lastCheckAt = row.last_check_at ? new Date(row.last_check_at).toISOString() : null;
+    return Buffer.from(JSON.stringify([lastCheckAt, row.contest_id])).toString('base64url');
+}
+
+function decodeContestListCursor(cursor?: string): { last_check_at: Date | null; contest_id: any } | null {
+    if (!cursor) {
+        return null;
+    }
+    try {
+        const [lastCheckAt, contestId] = JSON.parse(Buffer.from(cursor, 'base64url').toString());
+        return { last_check_at: lastCheckAt ? new Date(lastCheckAt) : null, contest_id: contestId };
+    } catch {
+        return null;
+    }
+}
+
+/**
+ * 基于 (last_check_at, contest_id) 的键集分页，按最后检查时间倒序。
+ *
+ * 游标记录上一页最后一行的排序键，下一页只取严格排在它之后的行；
+ * 结果通过 Mongo 游标逐行读取，多取一行用于判断是否还有下一页。
+ * 在物化概览上分页时 prefix 为空，游标条件直接作用于 (last_check_at, contest_id) 索引。
+ */
+async function aggregateContestSummaryPage(
+    collection: any, prefix: any[], cursor: string | undefined, pageSize: number
+): Promise<{ rows: any[]; next_cursor: string | null }> {
+    const pipeline = [...prefix];
+    const after = decodeContestListCursor(cursor);
+    if (after) {
+        // 降序排序中 null 排在最后：游标为 null 时只能继续向后翻 null 组内的行
+        const keyset: any[] = [{ last_check_at: after.last_check_at, contest_id: { $lt: after.contest_id } }];
+        if (after.last_check_at) {
+            keyset.push({ last_check_at: { $lt: after.last_check_at } }, { last_check_at: null });
+        }
+        pipeline.push({ $match: { $or: keyset } });
+    }
+    pipeline.push(
+        { $sort: { last_check_at: -1, contest_id: -1 } },
+        { $limit: pageSize + 1 },
+        CONTEST_SUMMARY_OUTPUT
+    );
+
+    const rows: any[] = [];
+    let hasMore = false;
+    for await (const row of collection.aggregate(pipeline)) {
+        if (rows.length === pageSize) {
+            hasMore = true;
+            break;
+        }
+        rows.push(row);
+    }
+    return {
+        rows,
+        next_cursor: hasMore ? encodeContestListCursor(rows[rows.length - 1]) : null
+    };
+}
+
+// 比赛列表页只需要的比赛字段
+const CONTEST_LIST_PROJECTION = { title: 1, content: 1, beginAt: 1, endAt: 1, pids: 1 } as const;
+
 /**
  * Contest Plagiarism List Handler - /plagiarism/contest
  */
@@ -303,130 +1062,210 @@ class ContestPlagiarismListHandler extends Handler {
     async get() {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
-        console.log('[Phosphorus] ContestPlagiarismListHandler.get() called');
+        logger.debug('ContestPlagiarismListHandler.get() called');
+        
+        const cursor = this.request.query.cursor as string | undefined;
+        const pageSize = Math.min(
+            Math.max(parseInt(this.request.query.page_size as string) || CONTEST_LIST_PAGE_SIZE, 1),
+            CONTEST_LIST_MAX_PAGE_SIZE
+        );
         
         try {
-            // 直接从数据库查询有查重结果的比赛
-            let plagiarismResults: any[] = [];
+            // 全局最新结果的校验值：既是条件请求校验值的一部分，也用于判断概览是否需要刷新
+            let resultValidator: string | null = null;
+            try {
+                resultValidator = await getResultValidator({});
+            } catch (error) {
+                logger.warn('Failed to compute contest list validator', error);
+            }
+            
+            // 有新结果时先合并进物化概览，再在概览上分页，只取回当前页的 contest_id / 已查题目数 / 最后检查时间
+            let page: { rows: any[]; next_cursor: string | null };
             
             try {
-                // 直接访问check_plagiarism_results集合
-                const db_raw = db as any;
-                plagiarismResults = await db_raw.db.collection('check_plagiarism_results').find({}).toArray();
+                if (!resultValidator || resultValidator !== contestSummariesValidator) {
+                    await refreshContestSummaries();
+                    contestSummariesValidator = resultValidator;
+                }
+                page = await aggregateContestSummaryPage(contestSummaryCollection(), [], cursor, pageSize);
             } catch (error) {
-                console.warn('Failed to query check_plagiarism_results collection:', error);
+                logger.warn('Failed to page contest summaries', error);
                 // 如果失败，尝试从document集合查询
-                plagiarismResults = await db.collection('document').find({
-                    docType: 'plagiarism_result'
-                }).toArray();
+                page = await aggregateContestSummaryPage(
+                    db.collection('document'), contestSummaryPipeline({ docType: 'plagiarism_result' }), cursor, pageSize
+                );
             }
+            const summaries = page.rows;
             
-            console.log(`[Phosphorus] Found ${plagiarismResults.length} plagiarism results in database`);
-            
-            // 按contest_id分组统计
-            const contestsMap = new Map<string, any>();
+            logger.debug(`Found ${summaries.length} contests with plagiarism results on this page`);
             
-            for (const result of plagiarismResults) {
-                const contestId = result.contest_id;
-                
-                if (!contestsMap.has(contestId)) {
-                    // 获取比赛基本信息
-                    let contestInfo: any = {
-                        id: contestId,
-                        title: `比赛 ${contestId}`,
-                        description: '',
-                        begin_at: null,
-                        end_at: null,
-                        total_problems: 0,
-                        checked_problems: 0,
-                        last_check_at: null,
-                        problem_ids: new Set()
-                    };
-                    
-                    // 尝试从比赛集合获取详细信息
-                    try {
-                        const contestDoc = await this.getContestFromDatabase(contestId);
-                        if (contestDoc) {
-                            contestInfo.title = contestDoc.title || `比赛 ${contestId}`;
-                            contestInfo.description = contestDoc.content || '';
-                            contestInfo.begin_at = contestDoc.beginAt;
-                            contestInfo.end_at = contestDoc.endAt;
-                            contestInfo.total_problems = Array.isArray(contestDoc.pids) ? contestDoc.pids.length : 0;
-                        }
-                    } catch (error) {
-                        console.warn(`Failed to get contest info for ${contestId}:`, error);
-                    }
-                    
-                    contestsMap.set(contestId, contestInfo);
-                }
-                
-                const contest = contestsMap.get(contestId);
-                
-                // 更新统计信息
-                contest.problem_ids.add(result.problem_id);
-                contest.checked_problems = contest.problem_ids.size;
-                
-                // 更新最后检查时间
-                if (result.created_at) {
-                    const checkTime = new Date(result.created_at);
-                    if (!contest.last_check_at || checkTime > contest.last_check_at) {
-                        contest.last_check_at = checkTime;
-                    }
-                }
+            // 用一次 $in 查询批量获取比赛信息（同时作为比赛文档的校验值）
+            let contestDocs = new Map<string, any>();
+            try {
+                contestDocs = await findContestDocuments(summaries.map((summary) => summary.contest_id?.toString()), CONTEST_LIST_PROJECTION);
+            } catch (error) {
+                logger.warn('Failed to batch load contest info', error);
             }
             
-            // 转换为数组并清理Set对象
-            const contests = Array.from(contestsMap.values()).map(contest => {
-                delete contest.problem_ids; // 删除临时的Set对象
-                return contest;
-            });
+            // 结果未变化时上面只有索引上的分页读取与一次 $in 查询，命中时跳过渲染
+            if (resultValidator && respondNotModified(this, `${resultValidator}|${contestDocumentsValidator(contestDocs)}`)) {
+                return;
+            }
             
-            // 按最后检查时间排序
-            contests.sort((a, b) => {
-                if (!a.last_check_at) return 1;
-                if (!b.last_check_at) return -1;
-                return b.last_check_at.getTime() - a.last_check_at.getTime();
+            const contests = summaries.map((summary) => {
+                const contestId = summary.contest_id;
+                const contestDoc = contestDocs.get(contestId?.toString());
+                return {
+                    id: contestId,
+                    title: contestDoc?.title || `比赛 ${contestId}`,
+                    description: contestDoc?.content || '',
+                    begin_at: contestDoc?.beginAt || null,
+                    end_at: contestDoc?.endAt || null,
+                    total_problems: Array.isArray(contestDoc?.pids) ? contestDoc.pids.length : 0,
+                    checked_problems: summary.checked_problems,
+                    last_check_at: summary.last_check_at ? new Date(summary.last_check_at) : null
+                };
             });
             
-            console.log(`[Phosphorus] Processed ${contests.length} contests with plagiarism data`);
+            logger.debug(`Processed ${contests.length} contests with plagiarism data`);
             
             this.response.template = 'plagiarism_contest_list.html';
-            this.response.body = { contests };
+            this.response.body = {
+                contests,
+                page_size: pageSize,
+                cursor: cursor || null,
+                next_cursor: page.next_cursor
+            };
             
         } catch (error: any) {
-            console.error('[Phosphorus] Exception in ContestPlagiarismListHandler:', error);
+            logger.error('Exception in ContestPlagiarismListHandler', error);
             this.response.template = 'plagiarism_contest_list.html';
             this.response.body = { contests: [], error: error.message };
         }
     }
+}
 
-    private async getContestFromDatabase(contestId: string): Promise<any> {
-        try {
-            // 直接查询比赛
-            if (contestId.length === 24 && /^[0-9a-fA-F]{24}$/.test(contestId)) {
-                try {
-                    return await db.collection('document').findOne({ 
-                        _id: contestId, 
-                        docType: 30 
-                    });
-                } catch (e) {
-                    console.log(`[Phosphorus] Direct query failed for ${contestId}`);
-                }
-            }
-            
-            // 遍历查找
-            const allContests = await db.collection('document').find({ docType: 30 }).toArray();
-            return allContests.find(doc => {
-                const docId = doc._id;
-                return docId.toString() === contestId.toString() || 
-                       (docId && typeof docId.toHexString === 'function' && docId.toHexString() === contestId) ||
-                       (doc.docId && doc.docId.toString() === contestId.toString());
-            });
-        } catch (error) {
-            console.error(`[Phosphorus] Error finding contest by ID ${contestId}:`, error);
-            return null;
+/**
+ * 每个题目最新一次分析的 analysis_id，$match + $sort 由
+ * (contest_id, problem_id, created_at desc) 索引支持，不读取结果文档中的大数组
+ */
+function latestAnalysisPipeline(match: Record<string, any>): any[] {
+    return [
+        { $match: match },
+        { $sort: { problem_id: 1, created_at: -1 } },
+        { $group: { _id: '$problem_id', analysis_id: { $first: '$analysis_id' } } },
+        { $sort: { _id: 1 } }
+    ];
+}
+
+// 摘要文档结构版本，结构变化时递增以触发重新计算
+const SUMMARY_SCHEMA_VERSION = 3;
+
+/**
+ * 从完整查重结果计算摘要：相似对数量、最高/平均相似度、直方图以及按语言/聚类统计
+ */
+function buildResultSummary(result: any): any {
+    const pairs: any[] = result.high_similarity_pairs || [];
+    const byLanguage = result.submission_stats?.by_language || {};
+    const stats = computePairStats(pairs, { clusters: result.clusters || [] });
+    
+    const languages = new Set<string>([...Object.keys(byLanguage), ...Object.keys(stats.by_language)]);
+    
+    return {
+        analysis_id: result.analysis_id,
+        contest_id: result.contest_id,
+        problem_id: result.problem_id,
+        schema_version: SUMMARY_SCHEMA_VERSION,
+        created_at: result.created_at,
+        summarized_at: new Date(),
+        total_submissions: result.total_submissions,
+        total_comparisons: result.total_comparisons,
+        execution_time_ms: result.execution_time_ms,
+        pair_count: stats.overall.count,
+        cluster_count: result.clusters?.length || 0,
+        failed_count: result.failed_submissions?.length || 0,
+        max_similarity: stats.overall.max,
+        avg_similarity_sum: stats.overall.sum,
+        avg_similarity_count: stats.overall.valued,
+        similarity_histogram: stats.overall.histogram,
+        languages: Array.from(languages),
+        // 与原有展示保持一致：只统计 submission_stats 中出现的语言
+        language_stats: Object.keys(byLanguage).map((language) => ({
+            language,
+            submission_count: byLanguage[language]?.count || 0,
+            high_similarity_pairs: stats.by_language[language]?.count || 0,
+            max_similarity: stats.by_language[language]?.max || 0,
+            avg_similarity: stats.by_language[language]?.mean || 0,
+            histogram: stats.by_language[language]?.histogram || []
+        })),
+        cluster_stats: Object.entries(stats.by_cluster).map(([cluster, clusterStats]) => ({
+            cluster,
+            pairs: clusterStats.count,
+            max_similarity: clusterStats.max,
+            avg_similarity: clusterStats.mean
+        }))
+    };
+}
+
+/**
+ * 按 analysis_id 读取 plagiarism_summaries 中的摘要；
+ * 缺失或版本过旧的摘要从完整结果计算一次后写回，之后的页面只读取摘要文档。
+ */
+async function getResultSummaries(analysisIds: string[], fullResults: any[] = []): Promise<Map<string, any>> {
+    const summaries = new Map<string, any>();
+    const ids = Array.from(new Set(analysisIds.filter((id) => id)));
+    if (ids.length === 0) {
+        return summaries;
+    }
+    
+    const summaryColl = (db as any).collection('plagiarism_summaries');
+    const existing = await summaryColl.find({
+        analysis_id: { $in: ids },
+        schema_version: SUMMARY_SCHEMA_VERSION
+    }, { projection: { _id: 0 } }).toArray();
+    for (const summary of existing) {
+        summaries.set(summary.analysis_id, summary);
+    }
+    
+    const missing = ids.filter((id) => !summaries.has(id));
+    if (missing.length === 0) {
+        return summaries;
+    }
+    
+    const known = new Map(fullResults.map((result) => [result.analysis_id, result]));
+    const toLoad = missing.filter((id) => !known.has(id));
+    if (toLoad.length > 0) {
+        const loaded = await (db as any).collection('check_plagiarism_results').find({ analysis_id: { $in: toLoad } }).toArray();
+        for (const result of loaded) {
+            known.set(result.analysis_id, result);
         }
     }
+    
+    const writes: any[] = [];
+    for (const id of missing) {
+        const result = known.get(id);
+        if (!result) {
+            continue;
+        }
+        const summary = buildResultSummary(result);
+        summaries.set(id, summary);
+        writes.push({ replaceOne: { filter: { analysis_id: id }, replacement: summary, upsert: true } });
+    }
+    if (writes.length > 0) {
+        await summaryColl.bulkWrite(writes, { ordered: false }).catch((error: any) => {
+            logger.warn('Failed to store plagiarism summaries', error);
+        });
+    }
+    return summaries;
+}
+
+/**
+ * 预先为比赛中每个题目的最新结果生成摘要（分析完成时调用）
+ */
+async function materializeContestSummaries(contestId: string): Promise<void> {
+    const latest = await (db as any).collection('check_plagiarism_results')
+        .aggregate(latestAnalysisPipeline({ contest_id: contestId })).toArray();
+    await getResultSummaries(latest.map((row: any) => row.analysis_id));
 }
 
 /**
@@ -436,6 +1275,18 @@ class ContestPlagiarismDetailHandler extends Handler {
     async get({ contest_id }: { contest_id: string }) {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
+        try {
+            const [resultValidator, contestValidator] = await Promise.all([
+                getResultValidator({ contest_id }),
+                getContestValidator(contest_id)
+            ]);
+            if (respondNotModified(this, `${resultValidator}|${contestValidator}`)) {
+                return;
+            }
+        } catch (error) {
+            logger.warn('Failed to compute contest validator', error);
+        }
+        
         try {
             // Get contest information
             const contest = await this.getContestInfo(contest_id);
@@ -444,13 +1295,10 @@ class ContestPlagiarismDetailHandler extends Handler {
             }
             
             // Get problems with plagiarism results
-            const problems = await this.getContestProblems(contest_id);
+            const problems = await this.getContestProblems(contest_id, contest.domain_id);
             
             // Calculate summary statistics
-            const totalHighSimilarity = problems.reduce((sum, p) => {
-                const pairs = p.plagiarism_result?.high_similarity_pairs || [];
-                return sum + pairs.length;
-            }, 0);
+            const totalHighSimilarity = problems.reduce((sum, p) => sum + (p.high_similarity_pairs || 0), 0);
             
             const avgSimilarity = this.calculateAverageSimilarity(problems);
             
@@ -472,87 +1320,33 @@ class ContestPlagiarismDetailHandler extends Handler {
     
     private async getContestInfo(contestId: string): Promise<any> {
         try {
-            console.log(`[Phosphorus] Looking up contest ${contestId} directly from database`);
-            
-            let contestDoc: any = null;
-            
-            // 首先尝试直接查询
-            if (contestId.length === 24 && /^[0-9a-fA-F]{24}$/.test(contestId)) {
-                try {
-                    contestDoc = await db.collection('document').findOne({ 
-                        _id: contestId, 
-                        docType: 30 
-                    });
-                    if (contestDoc) {
-                        console.log(`[Phosphorus] Found contest by direct query: ${contestDoc.title || 'Unknown'}`);
-                    }
-                } catch (e) {
-                    console.log(`[Phosphorus] Direct query failed: ${e}`);
-                }
-            }
+            logger.debug(`Looking up contest ${contestId} directly from database`);
             
-            // 如果直接查询失败，遍历所有比赛找匹配
-            if (!contestDoc) {
-                console.log('[Phosphorus] Searching for contest by iterating all contests...');
-                const allContests = await db.collection('document').find({ docType: 30 }).toArray();
-                
-                console.log(`[Phosphorus] Found ${allContests.length} contests in database`);
-                
-                // 调试：显示所有比赛ID
-                allContests.forEach((doc, index) => {
-                    if (index < 5) { // 只显示前5个避免日志过多
-                        console.log(`[Phosphorus] Contest ${index}: _id=${doc._id}, title=${doc.title}`);
-                    }
-                });
-                
-                // 尝试多种匹配方式
-                contestDoc = allContests.find(doc => {
-                    const docId = doc._id;
-                    const stringMatch = docId.toString() === contestId.toString();
-                    const hexMatch = docId && typeof docId.toHexString === 'function' && docId.toHexString() === contestId;
-                    const docIdMatch = doc.docId && doc.docId.toString() === contestId.toString();
-                    
-                    if (stringMatch || hexMatch || docIdMatch) {
-                        console.log(`[Phosphorus] Match found for ${contestId}: stringMatch=${stringMatch}, hexMatch=${hexMatch}, docIdMatch=${docIdMatch}`);
-                        return true;
-                    }
-                    return false;
-                });
-                
-                if (contestDoc) {
-                    console.log(`[Phosphorus] Found contest by iteration: ${contestDoc.title || 'Unknown'} with ID: ${contestDoc._id}`);
-                }
-            }
+            const contestDoc = await findContestDocument(contestId, this.args.domainId);
             
             if (contestDoc) {
-                console.log(`[Phosphorus] Found contest: ${contestDoc.title || 'Unknown'} with ID: ${contestDoc._id}`);
+                logger.debug(`Found contest: ${contestDoc.title || 'Unknown'} with ID: ${contestDoc._id}`);
                 
                 // 查询该比赛的查重结果统计
                 let checkedProblems = 0;
                 let lastCheckAt: Date | null = null;
                 
                 try {
-                    const plagiarismResults = await (db as any).collection('check_plagiarism_results').find({
-                        contest_id: contestId
-                    }).toArray();
-                    
-                    const problemIds = new Set();
-                    for (const result of plagiarismResults) {
-                        problemIds.add(result.problem_id);
-                        if (result.created_at) {
-                            const checkTime = new Date(result.created_at);
-                            if (!lastCheckAt || checkTime > lastCheckAt) {
-                                lastCheckAt = checkTime;
-                            }
-                        }
+                    const [summary] = await aggregateContestSummaries(
+                        (db as any).collection('check_plagiarism_results'),
+                        { contest_id: contestId }
+                    );
+                    if (summary) {
+                        checkedProblems = summary.checked_problems;
+                        lastCheckAt = summary.last_check_at ? new Date(summary.last_check_at) : null;
                     }
-                    checkedProblems = problemIds.size;
                 } catch (error) {
-                    console.warn('Failed to get plagiarism stats:', error);
+                    logger.warn('Failed to get plagiarism stats', error);
                 }
                 
                 return {
                     id: contestDoc._id.toString(),
+                    domain_id: contestDoc.domainId,
                     title: contestDoc.title || `比赛 ${contestDoc._id}`,
                     description: contestDoc.content || '',
                     begin_at: contestDoc.beginAt ? new Date(contestDoc.beginAt) : null,
@@ -562,37 +1356,37 @@ class ContestPlagiarismDetailHandler extends Handler {
                     last_check_at: lastCheckAt
                 };
             } else {
-                console.log(`[Phosphorus] Contest ${contestId} not found in database`);
+                logger.debug(`Contest ${contestId} not found in database`);
             }
             
         } catch (error) {
-            console.error('Failed to get contest info:', error);
+            logger.error('Failed to get contest info', error);
         }
         return null;
     }
     
-    private async getContestProblems(contestId: string): Promise<any[]> {
+    private async getContestProblems(contestId: string, domainId?: string): Promise<any[]> {
         try {
-            // 直接从数据库查询查重结果
-            const plagiarismResults = await db.collection('document').find({
-                contest_id: contestId,
-                docType: 'plagiarism_result' // 使用特殊的docType标识查重结果
-            }).toArray();
-            
-            // 如果没有找到，尝试直接查询check_plagiarism_results集合
-            let results = plagiarismResults;
-            if (results.length === 0) {
-                try {
-                    results = await (db as any).collection('check_plagiarism_results').find({
-                        contest_id: contestId
-                    }).toArray();
-                } catch (error) {
-                    console.warn('Failed to query check_plagiarism_results collection:', error);
-                    results = [];
-                }
+            // 每个题目最新一次分析的 analysis_id，再读取对应的摘要文档
+            let results: any[] = [];
+            try {
+                const latest = await (db as any).collection('check_plagiarism_results')
+                    .aggregate(latestAnalysisPipeline({ contest_id: contestId })).toArray();
+                const summaries = await getResultSummaries(latest.map((row: any) => row.analysis_id));
+                results = latest.map((row: any) => summaries.get(row.analysis_id)).filter((summary: any) => summary);
+            } catch (error) {
+                logger.warn('Failed to query check_plagiarism_results collection', error);
             }
             
-            console.log(`[Phosphorus] Found ${results.length} plagiarism results for contest ${contestId}`);
+            logger.debug(`Found ${results.length} plagiarism results for contest ${contestId}`);
+            
+            // 一次 $in 查询批量获取所有题目标题
+            let problemTitles = new Map<string, string>();
+            try {
+                problemTitles = await findProblemTitles(results.map((result) => result.problem_id), domainId);
+            } catch (error) {
+                logger.warn(`Failed to get problem info for contest ${contestId}`, error);
+            }
             
             // 按problem_id分组整理结果
             const problemsMap = new Map<number, any>();
@@ -612,19 +1406,10 @@ class ContestPlagiarismDetailHandler extends Handler {
                         plagiarism_result: null
                     };
                     
-                    // 尝试从题目集合获取更详细的信息
-                    try {
-                        const problemDoc = await db.collection('document').findOne({
-                            docType: 10, // 题目文档类型
-                            pid: problemId
-                        });
-                        
-                        if (problemDoc) {
-                            problemInfo.title = problemDoc.title || `题目 ${problemId}`;
-                            // 可以添加更多字段
-                        }
-                    } catch (error) {
-                        console.warn(`Failed to get problem info for ${problemId}:`, error);
+                    // 使用批量查询得到的题目标题
+                    const problemTitle = problemTitles.get(String(problemId));
+                    if (problemTitle) {
+                        problemInfo.title = problemTitle;
                     }
                     
                     problemsMap.set(problemId, problemInfo);
@@ -632,38 +1417,33 @@ class ContestPlagiarismDetailHandler extends Handler {
                 
                 const problem = problemsMap.get(problemId);
                 
-                // 更新查重结果信息
+                // 每个题目只有最新一次分析的摘要
+                // 查重结果信息（概览页不携带相似对/聚类数组，完整数据只在题目详情页加载）
                 problem.plagiarism_result = {
                     analysis_id: result.analysis_id,
                     total_submissions: result.total_submissions,
                     total_comparisons: result.total_comparisons,
                     execution_time_ms: result.execution_time_ms,
-                    high_similarity_pairs: result.high_similarity_pairs || [],
-                    clusters: result.clusters || [],
-                    submission_stats: result.submission_stats || [],
-                    failed_submissions: result.failed_submissions || [],
+                    high_similarity_pairs_count: result.pair_count,
+                    clusters_count: result.cluster_count,
+                    failed_submissions_count: result.failed_count,
                     created_at: result.created_at
                 };
                 
                 // 更新统计信息
                 problem.total_submissions = result.total_submissions;
-                problem.checked_submissions = result.total_submissions - (result.failed_submissions?.length || 0);
+                problem.checked_submissions = result.total_submissions - result.failed_count;
                 problem.last_check_at = result.created_at;
                 
-                // 计算最高相似度和相似对数量
-                problem.high_similarity_pairs = result.high_similarity_pairs?.length || 0;
-                let maxSimilarity = 0;
-                if (result.high_similarity_pairs && result.high_similarity_pairs.length > 0) {
-                    result.high_similarity_pairs.forEach((pair: any) => {
-                        const avgSim = pair.similarities?.AVG || 0;
-                        const maxSim = pair.similarities?.MAX || 0;
-                        maxSimilarity = Math.max(maxSimilarity, avgSim, maxSim);
-                    });
-                }
-                problem.max_similarity = maxSimilarity;
+                // 最高相似度和相似对数量已在摘要中计算
+                problem.high_similarity_pairs = result.pair_count;
+                problem.max_similarity = result.max_similarity;
+                problem.avg_similarity_sum = result.avg_similarity_sum;
+                problem.avg_similarity_count = result.avg_similarity_count;
+                problem.languages = result.languages || [];
                 
-                // 从high_similarity_pairs中提取语言信息（如果可能）
-                if (result.high_similarity_pairs && result.high_similarity_pairs.length > 0) {
+                // 结果中没有语言信息时使用默认值
+                if (result.pair_count > 0) {
                     // 这里可以根据submission名称推断语言，但数据结构中没有直接的语言信息
                     // 暂时使用默认值
                     if (problem.languages.length === 0) {
@@ -675,31 +1455,335 @@ class ContestPlagiarismDetailHandler extends Handler {
             // 转换Map为数组并排序
             const problems = Array.from(problemsMap.values()).sort((a, b) => a.id - b.id);
             
-            console.log(`[Phosphorus] Processed ${problems.length} problems with plagiarism data`);
+            logger.debug(`Processed ${problems.length} problems with plagiarism data`);
             return problems;
             
         } catch (error) {
-            console.error('Failed to get contest problems from database:', error);
+            logger.error('Failed to get contest problems from database', error);
             return [];
         }
     }
     
     private calculateAverageSimilarity(problems: any[]): number | null {
-        const similarities: number[] = [];
+        let sum = 0;
+        let count = 0;
         
         problems.forEach(problem => {
-            const result = problem.plagiarism_result;
-            if (result?.high_similarity_pairs) {
-                result.high_similarity_pairs.forEach((pair: any) => {
-                    const avgSim = pair.similarities?.AVG;
-                    if (typeof avgSim === 'number') {
-                        similarities.push(avgSim);
+            sum += problem.avg_similarity_sum || 0;
+            count += problem.avg_similarity_count || 0;
+        });
+        
+        return count > 0 ? sum / count : null;
+    }
+}
+
+// 相似对分页接口：默认/最大每页数量与可用的排序字段
+const PAIRS_PAGE_SIZE = 50;
+const PAIRS_MAX_PAGE_SIZE = 500;
+// 题目详情页每种语言预先渲染的相似对数量
+const LANGUAGE_PAIRS_PREVIEW = 5;
+const PAIR_SORT_FIELDS: Record<string, string> = {
+    similarity: '_similarity',
+    max_similarity: 'similarities.MAX',
+    first_submission: 'first_submission',
+    second_submission: 'second_submission'
+};
+
+// 排序与筛选用到的相似对字段，分页时只展开这些字段
+const PAIR_KEY_FIELDS = [
+    'first_submission', 'second_submission', 'user1', 'user2', 'first_user_id', 'second_user_id', 'file1_language', 'file2_language'
+];
+
+interface PairQueryOptions {
+    analysis_id?: string;
+    offset?: number;
+    limit?: number;
+    min_similarity?: number;
+    language?: string;
+    user?: string;
+    sort?: string;
+    order?: 'asc' | 'desc';
+}
+
+/**
+ * 在MongoDB中展开并过滤某个题目最新（或指定）结果的相似对，只返回请求的那一页，
+ * 不将完整的结果文档加载到 Node 内存中。展开与排序只作用于轻量的键，完整相似对按下标取回。
+ */
+async function queryResultPairs(
+    contestId: string, problemId: number, options: PairQueryOptions = {}
+): Promise<{ analysis_id: string | null; total: number; offset: number; limit: number; pairs: any[] }> {
+    const offset = Math.max(options.offset || 0, 0);
+    const limit = Math.min(Math.max(options.limit || PAIRS_PAGE_SIZE, 1), PAIRS_MAX_PAGE_SIZE);
+    const sortField = PAIR_SORT_FIELDS[options.sort || 'similarity'] || PAIR_SORT_FIELDS.similarity;
+    const sortOrder = options.order === 'asc' ? 1 : -1;
+    
+    const match: Record<string, any> = { contest_id: contestId, problem_id: problemId };
+    if (options.analysis_id) {
+        match.analysis_id = options.analysis_id;
+    }
+    
+    const filters: Record<string, any>[] = [];
+    if (typeof options.min_similarity === 'number' && !Number.isNaN(options.min_similarity)) {
+        filters.push({ _similarity: { $gte: options.min_similarity } });
+    }
+    if (options.language) {
+        filters.push({ $or: [{ file1_language: options.language }, { file2_language: options.language }] });
+    }
+    if (options.user) {
+        const values: any[] = [options.user];
+        if (/^\d+$/.test(options.user)) {
+            values.push(parseInt(options.user));
+        }
+        filters.push({
+            $or: ['user1', 'user2', 'first_user_id', 'second_user_id', 'first_submission', 'second_submission']
+                .map((field) => ({ [field]: { $in: values } }))
+        });
+    }
+    
+    // 第一步只在每个相似对的排序 / 筛选字段上展开、过滤和排序，得到当前页的数组下标
+    const results = (db as any).collection('check_plagiarism_results');
+    const [page] = await results.aggregate([
+        { $match: match },
+        { $sort: { created_at: -1 } },
+        { $limit: 1 },
+        {
+            $project: {
+                _id: 0,
+                analysis_id: 1,
+                keys: {
+                    $map: {
+                        input: { $range: [0, { $size: { $ifNull: ['$high_similarity_pairs', []] } }] },
+                        as: 'index',
+                        in: {
+                            $let: {
+                                vars: { pair: { $arrayElemAt: ['$high_similarity_pairs', '$$index'] } },
+                                in: {
+                                    pair_index: '$$index',
+                                    _similarity: { $ifNull: ['$$pair.similarity', '$$pair.similarities.AVG'] },
+                                    similarities: { MAX: '$$pair.similarities.MAX' },
+                                    ...Object.fromEntries(PAIR_KEY_FIELDS.map((field) => [field, `$$pair.${field}`]))
+                                }
+                            }
+                        }
                     }
-                });
+                }
             }
+        },
+        { $unwind: '$keys' },
+        { $replaceRoot: { newRoot: { $mergeObjects: ['$keys', { analysis_id: '$analysis_id' }] } } },
+        ...(filters.length > 0 ? [{ $match: { $and: filters } }] : []),
+        {
+            $facet: {
+                total: [{ $count: 'count' }],
+                rows: [
+                    { $sort: { [sortField]: sortOrder, pair_index: 1 } },
+                    { $skip: offset },
+                    { $limit: limit },
+                    { $project: { _id: 0, analysis_id: 1, pair_index: 1 } }
+                ]
+            }
+        }
+    ], { allowDiskUse: true }).toArray();
+    
+    // 第二步按下标取回当前页的完整相似对
+    const rows: { analysis_id: string; pair_index: number }[] = page?.rows || [];
+    const analysisId = rows[0]?.analysis_id || options.analysis_id || null;
+    let pairs: any[] = [];
+    if (rows.length > 0) {
+        const indexes = rows.map((row) => row.pair_index);
+        const [doc] = await results.aggregate([
+            { $match: { ...match, analysis_id: analysisId } },
+            { $sort: { created_at: -1 } },
+            { $limit: 1 },
+            {
+                $project: {
+                    _id: 0,
+                    pairs: { $map: { input: indexes, as: 'index', in: { $arrayElemAt: ['$high_similarity_pairs', '$$index'] } } }
+                }
+            }
+        ]).toArray();
+        pairs = (doc?.pairs || []).map((pair: any, i: number) => ({ ...pair, analysis_id: analysisId, pair_index: indexes[i] }));
+    }
+    
+    return {
+        analysis_id: analysisId,
+        total: page?.total?.[0]?.count || 0,
+        offset,
+        limit,
+        pairs
+    };
+}
+
+/**
+ * Problem Pairs Handler - /plagiarism/contest/:contest_id/:problem_id/pairs
+ *
+ * 查询参数: offset, limit, min_similarity, language, user, sort, order, analysis_id
+ */
+class ProblemPairsHandler extends Handler {
+    async get({ contest_id, problem_id }: { contest_id: string; problem_id: string }) {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const query = this.request.query as Record<string, string>;
+        const problemId = parseInt(problem_id);
+        
+        try {
+            if (respondNotModified(this, await getResultValidator({ contest_id, problem_id: problemId }))) {
+                return;
+            }
+            
+            const page = await queryResultPairs(contest_id, problemId, {
+                analysis_id: query.analysis_id || undefined,
+                offset: parseInt(query.offset) || 0,
+                limit: parseInt(query.limit) || PAIRS_PAGE_SIZE,
+                min_similarity: query.min_similarity !== undefined ? parseFloat(query.min_similarity) : undefined,
+                language: query.language || undefined,
+                user: query.user || undefined,
+                sort: query.sort || 'similarity',
+                order: query.order === 'asc' ? 'asc' : 'desc'
+            });
+            
+            this.response.body = { success: true, ...page };
+            this.response.type = 'application/json';
+        } catch (error: any) {
+            logger.error('Failed to query pairs', error);
+            this.response.status = 500;
+            this.response.body = { success: false, error: error.message, pairs: [] };
+            this.response.type = 'application/json';
+        }
+    }
+}
+
+// CSV 导出的固定列，其余字段以 JSON 形式放入 details 列
+const EXPORT_CSV_COLUMNS = [
+    'type', 'contest_id', 'problem_id', 'analysis_id',
+    'first_submission', 'second_submission', 'user1', 'user2', 'file1_language', 'file2_language',
+    'similarity', 'avg_similarity', 'max_similarity',
+    'cluster_index', 'cluster_size', 'cluster_average_similarity', 'cluster_members',
+    'details'
+];
+
+function toCsvValue(value: any): string {
+    if (value === null || value === undefined) {
+        return '';
+    }
+    const text = typeof value === 'object' ? JSON.stringify(value) : String(value);
+    return /[",\r\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
+}
+
+function toCsvLine(row: any): string {
+    const line: Record<string, any> = {
+        type: row.type,
+        contest_id: row.contest_id,
+        problem_id: row.problem_id,
+        analysis_id: row.analysis_id
+    };
+    if (row.type === 'pair') {
+        const { type, contest_id, problem_id, analysis_id, similarities, ...pair } = row;
+        Object.assign(line, {
+            first_submission: pair.first_submission,
+            second_submission: pair.second_submission,
+            user1: pair.user1,
+            user2: pair.user2,
+            file1_language: pair.file1_language,
+            file2_language: pair.file2_language,
+            similarity: pair.similarity,
+            avg_similarity: similarities?.AVG,
+            max_similarity: similarities?.MAX
         });
+    } else if (row.type === 'cluster') {
+        Object.assign(line, {
+            cluster_index: row.index,
+            cluster_size: row.size,
+            cluster_average_similarity: row.average_similarity,
+            cluster_members: Array.isArray(row.members) ? row.members.join(' ') : row.members
+        });
+    } else {
+        line.details = row.data;
+    }
+    return `${EXPORT_CSV_COLUMNS.map((column) => toCsvValue(line[column])).join(',')}\n`;
+}
+
+/**
+ * 逐行产出一次分析的提交统计、相似对与聚类。
+ * 数组在MongoDB中展开，Node 端只持有当前批次，内存占用与结果大小无关。
+ */
+async function* exportAnalysisRows(analysisId: string): AsyncGenerator<any> {
+    const coll = (db as any).collection('check_plagiarism_results');
+    const meta = await coll.findOne({ analysis_id: analysisId }, {
+        projection: { _id: 0, contest_id: 1, problem_id: 1, analysis_id: 1, created_at: 1, total_submissions: 1, total_comparisons: 1, submission_stats: 1, failed_submissions: 1 }
+    });
+    if (!meta) {
+        return;
+    }
+    const base = { contest_id: meta.contest_id, problem_id: meta.problem_id, analysis_id: meta.analysis_id };
+    yield {
+        type: 'submission_stats',
+        ...base,
+        data: {
+            created_at: meta.created_at,
+            total_submissions: meta.total_submissions,
+            total_comparisons: meta.total_comparisons,
+            submission_stats: meta.submission_stats,
+            failed_submissions: meta.failed_submissions
+        }
+    };
+    
+    for (const [field, type] of [['high_similarity_pairs', 'pair'], ['clusters', 'cluster']]) {
+        const cursor = coll.aggregate([
+            { $match: { analysis_id: analysisId } },
+            { $project: { _id: 0, item: `$${field}` } },
+            { $unwind: '$item' },
+            { $replaceRoot: { newRoot: '$item' } }
+        ], { batchSize: 500 });
+        for await (const item of cursor) {
+            yield { type, ...base, ...item };
+        }
+    }
+}
+
+/**
+ * 导出比赛（每个题目的最新结果）或单个题目的全部数据
+ */
+async function* exportResultRows(contestId: string, problemId?: number): AsyncGenerator<any> {
+    const match: Record<string, any> = { contest_id: contestId };
+    if (problemId !== undefined) {
+        match.problem_id = problemId;
+    }
+    const latest = (db as any).collection('check_plagiarism_results').aggregate(latestAnalysisPipeline(match));
+    for await (const row of latest) {
+        if (row.analysis_id) {
+            yield* exportAnalysisRows(row.analysis_id);
+        }
+    }
+}
+
+/**
+ * Export Handler - /plagiarism/contest/:contest_id/download, /plagiarism/contest/:contest_id/:problem_id/download
+ *
+ * ?format=ndjson（默认）或 ?format=csv，以流的形式写出，不缓冲完整结果
+ */
+class PlagiarismExportHandler extends Handler {
+    async get({ contest_id, problem_id }: { contest_id: string; problem_id?: string }) {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const format = this.request.query.format === 'csv' ? 'csv' : 'ndjson';
+        const problemId = problem_id !== undefined ? parseInt(problem_id) : undefined;
+        const filename = problemId !== undefined
+            ? `problem_${problemId}_plagiarism_report.${format}`
+            : `contest_${contest_id}_plagiarism_report.${format}`;
+        
+        async function* lines() {
+            if (format === 'csv') {
+                yield `${EXPORT_CSV_COLUMNS.join(',')}\n`;
+            }
+            for await (const row of exportResultRows(contest_id, problemId)) {
+                yield format === 'csv' ? toCsvLine(row) : `${JSON.stringify(row)}\n`;
+            }
+        }
         
-        return similarities.length > 0 ? similarities.reduce((a, b) => a + b, 0) / similarities.length : null;
+        this.response.type = format === 'csv' ? 'text/csv; charset=utf-8' : 'application/x-ndjson; charset=utf-8';
+        this.response.addHeader('Content-Disposition', `attachment; filename="${filename}"`);
+        this.response.body = Readable.from(lines());
     }
 }
 
@@ -711,7 +1795,19 @@ class ProblemPlagiarismDetailHandler extends Handler {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
         try {
-            console.log(`[Phosphorus] ProblemPlagiarismDetailHandler.get() called for contest ${contest_id}, problem ${problem_id}`);
+            const [resultValidator, contestValidator] = await Promise.all([
+                getResultValidator({ contest_id, problem_id: parseInt(problem_id) }),
+                getContestValidator(contest_id)
+            ]);
+            if (respondNotModified(this, `${resultValidator}|${contestValidator}`)) {
+                return;
+            }
+        } catch (error) {
+            logger.warn('Failed to compute problem validator', error);
+        }
+        
+        try {
+            logger.debug(`ProblemPlagiarismDetailHandler.get() called for contest ${contest_id}, problem ${problem_id}`);
             
             // Get contest information from database
             const contest = await this.findContestById(contest_id);
@@ -720,17 +1816,18 @@ class ProblemPlagiarismDetailHandler extends Handler {
             }
             
             // Get plagiarism results for this specific problem (get the latest one)
-            console.log(`[Phosphorus] Querying plagiarism results for contest ${contest_id}, problem ${problem_id}`);
+            logger.debug(`Querying plagiarism results for contest ${contest_id}, problem ${problem_id}`);
+            // 相似对数组不随页面加载，由 /pairs 接口分页提供
             const plagiarismResult = await (db as any).collection('check_plagiarism_results').findOne({
                 contest_id: contest_id,
                 problem_id: parseInt(problem_id)
             }, {
-                sort: { created_at: -1 } // 获取最新的查重结果
+                sort: { created_at: -1 }, // 获取最新的查重结果
+                projection: { high_similarity_pairs: 0 }
             });
             
-            console.log(`[Phosphorus] Plagiarism result found:`, !!plagiarismResult);
             if (plagiarismResult) {
-                console.log(`[Phosphorus] Result details:`, {
+                logger.debug('Plagiarism result found', {
                     analysis_id: plagiarismResult.analysis_id,
                     total_submissions: plagiarismResult.total_submissions,
                     created_at: plagiarismResult.created_at
@@ -738,7 +1835,7 @@ class ProblemPlagiarismDetailHandler extends Handler {
             }
             
             if (!plagiarismResult) {
-                console.log(`[Phosphorus] No plagiarism result found for contest ${contest_id}, problem ${problem_id}`);
+                logger.debug(`No plagiarism result found for contest ${contest_id}, problem ${problem_id}`);
                 this.response.template = 'plagiarism_problem_detail.html';
                 this.response.body = {
                     contest,
@@ -748,32 +1845,48 @@ class ProblemPlagiarismDetailHandler extends Handler {
                 return;
             }
             
+            // 语言统计来自摘要文档（单次遍历计算，已有摘要时直接读取）
+            let summary: any;
+            try {
+                summary = (await getResultSummaries([plagiarismResult.analysis_id])).get(plagiarismResult.analysis_id);
+            } catch (error) {
+                logger.warn('Failed to load plagiarism summary', error);
+            }
+            summary = summary || buildResultSummary(plagiarismResult);
+            
+            // 首屏每种语言只加载前几个相似对，其余由 /pairs 接口分页提供
+            const pairsUrl = `/plagiarism/contest/${contest_id}/${problem_id}/pairs`;
+            const languageStats = this.processLanguageStats(summary);
+            const languageResults = await this.loadLanguageResults(
+                contest_id, parseInt(problem_id), plagiarismResult.analysis_id, languageStats
+            );
+            
             // Process the plagiarism result
             const problemData = {
                 id: problem_id,
                 title: plagiarismResult.problem_title || `题目 ${problem_id}`,
                 total_submissions: plagiarismResult.submission_stats?.total_submissions || 0,
-                high_similarity_pairs: plagiarismResult.high_similarity_pairs?.length || 0,
+                high_similarity_pairs: summary.pair_count || 0,
                 max_similarity: plagiarismResult.max_similarity || 0,
                 avg_similarity: plagiarismResult.avg_similarity || 0,
                 clusters: plagiarismResult.clusters || [],
-                high_similarity_pairs_data: plagiarismResult.high_similarity_pairs || [],
-                languages: this.extractLanguages(plagiarismResult),
-                language_stats: this.processLanguageStats(plagiarismResult)
+                pairs_url: pairsUrl,
+                languages: summary.languages,
+                language_stats: languageStats
             };
             
-            console.log(`[Phosphorus] Found plagiarism result with ${problemData.high_similarity_pairs} high similarity pairs`);
+            logger.debug(`Found plagiarism result with ${problemData.high_similarity_pairs} high similarity pairs`);
             
             this.response.template = 'plagiarism_problem_detail.html';
             this.response.body = {
                 contest,
                 problem: problemData,
-                plagiarism_result: plagiarismResult,
+                language_results: languageResults,
                 enhanced_url: `/plagiarism/enhanced/contest/${contest_id}/problem/${problem_id}`
             };
             
         } catch (error: any) {
-            console.error('[Phosphorus] Exception in ProblemPlagiarismDetailHandler:', error);
+            logger.error('Exception in ProblemPlagiarismDetailHandler', error);
             if (error instanceof NotFoundError) {
                 throw error;
             }
@@ -782,122 +1895,52 @@ class ProblemPlagiarismDetailHandler extends Handler {
         }
     }
     
-    private extractLanguages(plagiarismResult: any): string[] {
-        const languages = new Set<string>();
-        
-        // Extract from high similarity pairs
-        if (plagiarismResult.high_similarity_pairs) {
-            plagiarismResult.high_similarity_pairs.forEach((pair: any) => {
-                if (pair.file1_language) languages.add(pair.file1_language);
-                if (pair.file2_language) languages.add(pair.file2_language);
-            });
-        }
-        
-        // Extract from submission stats
-        if (plagiarismResult.submission_stats?.by_language) {
-            Object.keys(plagiarismResult.submission_stats.by_language).forEach(lang => {
-                languages.add(lang);
-            });
-        }
-        
-        return Array.from(languages);
-    }
-    
-    private processLanguageStats(plagiarismResult: any): any[] {
-        const stats: any[] = [];
-        
-        if (plagiarismResult.submission_stats?.by_language) {
-            Object.entries(plagiarismResult.submission_stats.by_language).forEach(([language, data]: [string, any]) => {
-                stats.push({
-                    language,
-                    language_display: this.getLanguageDisplayName(language),
-                    language_icon: this.getLanguageIcon(language),
-                    submission_count: data.count || 0,
-                    high_similarity_pairs: this.countHighSimilarityPairsByLanguage(plagiarismResult, language),
-                    max_similarity: this.getMaxSimilarityByLanguage(plagiarismResult, language),
-                    avg_similarity: this.getAvgSimilarityByLanguage(plagiarismResult, language)
-                });
+    /**
+     * 按语言取第一页相似对；没有按语言的提交统计时，以全部相似对作为一组
+     */
+    private async loadLanguageResults(contestId: string, problemId: number, analysisId: string, languageStats: any[]): Promise<any[]> {
+        const groups = languageStats.length > 0
+            ? languageStats
+            : [{ language: '', language_display: '全部语言', submission_count: 0, max_similarity: 0 }];
+        return Promise.all(groups.map(async (stat: any) => {
+            const page = await queryResultPairs(contestId, problemId, {
+                analysis_id: analysisId,
+                language: stat.language || undefined,
+                limit: LANGUAGE_PAIRS_PREVIEW
+            }).catch((error) => {
+                logger.warn('Failed to load first page of pairs', { language: stat.language, error });
+                return { total: 0, pairs: [] as any[] };
             });
-        }
-        
-        return stats.sort((a, b) => b.submission_count - a.submission_count);
-    }
-    
-    private countHighSimilarityPairsByLanguage(plagiarismResult: any, language: string): number {
-        if (!plagiarismResult.high_similarity_pairs) return 0;
-        
-        return plagiarismResult.high_similarity_pairs.filter((pair: any) => 
-            pair.file1_language === language || pair.file2_language === language
-        ).length;
-    }
-    
-    private getMaxSimilarityByLanguage(plagiarismResult: any, language: string): number {
-        if (!plagiarismResult.high_similarity_pairs) return 0;
-        
-        const pairs = plagiarismResult.high_similarity_pairs.filter((pair: any) => 
-            pair.file1_language === language || pair.file2_language === language
-        );
-        
-        if (pairs.length === 0) return 0;
-        
-        return Math.max(...pairs.map((pair: any) => pair.similarity || 0));
+            return {
+                language: stat.language,
+                language_display: stat.language_display,
+                total_submissions: stat.submission_count,
+                max_similarity: stat.max_similarity,
+                avg_similarity: stat.avg_similarity,
+                high_similarity_pairs: page.pairs,
+                pairs_total: page.total
+            };
+        }));
     }
     
-    private getAvgSimilarityByLanguage(plagiarismResult: any, language: string): number {
-        if (!plagiarismResult.high_similarity_pairs) return 0;
-        
-        const pairs = plagiarismResult.high_similarity_pairs.filter((pair: any) => 
-            pair.file1_language === language || pair.file2_language === language
-        );
-        
-        if (pairs.length === 0) return 0;
-        
-        const totalSimilarity = pairs.reduce((sum: number, pair: any) => sum + (pair.similarity || 0), 0);
-        return totalSimilarity / pairs.length;
+    private processLanguageStats(summary: any): any[] {
+        return (summary.language_stats || []).map((stat: any) => ({
+            ...stat,
+            language_display: this.getLanguageDisplayName(stat.language),
+            language_icon: this.getLanguageIcon(stat.language)
+        })).sort((a: any, b: any) => b.submission_count - a.submission_count);
     }
     
     private async findContestById(contestId: string): Promise<any | null> {
         try {
-            const documentColl = db.collection('document');
-            let contest: any = null;
-            
-            // 首先尝试直接查询 (如果contestId是有效的ObjectId格式)
-            if (contestId.length === 24 && /^[0-9a-fA-F]{24}$/.test(contestId)) {
-                try {
-                    // 尝试直接用字符串查询，让MongoDB自动转换
-                    contest = await documentColl.findOne({ 
-                        _id: contestId,
-                        docType: 30 // 比赛文档类型
-                    });
-                } catch (error) {
-                    // 如果直接查询失败，继续其他方法
-                    console.log(`[Phosphorus] Direct query failed for contest ${contestId}, trying alternative methods`);
-                }
-            }
+            const contest = await findContestDocument(contestId, this.args.domainId);
             
-            // 如果直接查询失败，尝试遍历匹配
             if (!contest) {
-                try {
-                    const allContests = await documentColl.find({ docType: 30 }).toArray();
-                    
-                    // 尝试多种匹配方式
-                    contest = allContests.find((c: any) => {
-                        const docId = c._id;
-                        return docId.toString() === contestId.toString() ||
-                               (docId && typeof docId.toHexString === 'function' && docId.toHexString() === contestId) ||
-                               (c.docId && c.docId.toString() === contestId.toString());
-                    }) || null;
-                } catch (error) {
-                    console.error(`[Phosphorus] Alternative query also failed for contest ${contestId}:`, error);
-                }
-            }
-            
-            if (!contest) {
-                console.log(`[Phosphorus] Contest not found with string ID: ${contestId}`);
+                logger.debug(`Contest not found with string ID: ${contestId}`);
                 return null;
             }
             
-            console.log(`[Phosphorus] Found contest: ${contest.title || contest._id}`);
+            logger.debug(`Found contest: ${contest.title || contest._id}`);
             
             return {
                 id: contest._id.toString(),
@@ -919,7 +1962,7 @@ class ProblemPlagiarismDetailHandler extends Handler {
                 status: this.getContestStatus(contest)
             };
         } catch (error) {
-            console.error('Failed to get contest by ID:', error);
+            logger.error('Failed to get contest by ID', error);
             return null;
         }
     }
@@ -1031,14 +2074,14 @@ class PlagiarismApiHandler extends Handler {
         
         try {
             const contestId = this.request.query.contest_id;
-            console.log('API Request - Contest ID:', contestId);
+            logger.debug('API request for contest problems', { contestId });
             
             if (!contestId) {
                 throw new Error('缺少比赛ID参数');
             }
             
             const problems = await this.getContestProblems(contestId);
-            console.log('API Response - Problems count:', problems.length);
+            logger.debug('API response for contest problems', { contestId, count: problems.length });
             
             this.response.body = {
                 success: true,
@@ -1046,7 +2089,7 @@ class PlagiarismApiHandler extends Handler {
             };
             this.response.type = 'application/json';
         } catch (error: any) {
-            console.error('API Error:', error);
+            logger.error('API Error', error);
             this.response.body = {
                 success: false,
                 error: error.message,
@@ -1059,10 +2102,7 @@ class PlagiarismApiHandler extends Handler {
     private async getContestProblems(contestId: string): Promise<any[]> {
         try {
             // 查找比赛文档
-            const contestDoc = await db.collection('document').findOne({ 
-                _id: contestId,
-                docType: 30 
-            });
+            const contestDoc = await findContestDocument(contestId, this.args.domainId, { pids: 1 });
             
             if (!contestDoc || !contestDoc.pids) {
                 return [];
@@ -1083,25 +2123,50 @@ class PlagiarismApiHandler extends Handler {
                 can_analyze: (doc.nSubmit || 0) >= 5
             }));
         } catch (error) {
-            console.error('Failed to get contest problems:', error);
+            logger.error('Failed to get contest problems', error);
             return [];
         }
     }
 }
 
 /**
- * New Plagiarism Task Handler - /plagiarism/new
+ * 运行指标接口 - /plagiarism/api/metrics
  */
-class NewPlagiarismTaskHandler extends Handler {
+class PlagiarismMetricsHandler extends Handler {
     async get() {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
-        try {
-            // 获取所有比赛信息用于下拉选择
-            const contests = await this.getAllContests();
-            
-            this.response.template = 'new_task.html';
-            this.response.body = {
+        this.response.body = {
+            success: true,
+            collected_at: new Date(),
+            // 上游连接复用：reused / new 之比反映 keep-alive 的命中情况
+            http_client: {
+                ...httpClientStats,
+                inflight_requests: inflightRequests.size,
+                max_sockets: settings.http.max_sockets
+            },
+            response_cache: responseCache.getStats(),
+            compression: { ...compressionStats },
+            // 回退到全表扫描的查询（插件加载时通过 explain 检查）
+            indexes: indexReport
+        };
+        this.response.type = 'application/json';
+    }
+}
+
+/**
+ * New Plagiarism Task Handler - /plagiarism/new
+ */
+class NewPlagiarismTaskHandler extends Handler {
+    async get() {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        try {
+            // 获取所有比赛信息用于下拉选择
+            const contests = await this.getAllContests();
+            
+            this.response.template = 'new_task.html';
+            this.response.body = {
                 contests: contests
             };
         } catch (error: any) {
@@ -1117,9 +2182,13 @@ class NewPlagiarismTaskHandler extends Handler {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
         try {
-            const { contest_id, problem_ids, min_tokens = 9, similarity_threshold = 0.7 } = this.request.body;
+            const {
+                contest_id, problem_ids,
+                min_tokens = settings.detection.default_min_tokens,
+                similarity_threshold = settings.detection.default_similarity_threshold
+            } = this.request.body;
             
-            console.log('[Phosphorus] NewPlagiarismTaskHandler.post() called with:', {
+            logger.debug('NewPlagiarismTaskHandler.post() called', {
                 contest_id, problem_ids, min_tokens, similarity_threshold
             });
             
@@ -1135,45 +2204,38 @@ class NewPlagiarismTaskHandler extends Handler {
             // 获取比赛信息用于显示
             const contest = await this.getContestById(contest_id.toString());
             
-            // 调用Phosphorus API创建异步查重任务
             const taskData = {
                 contest_id: contest_id.toString(),
                 problem_ids: problem_ids.map((id: any) => parseInt(id.toString())),
                 min_tokens: parseInt(min_tokens.toString()),
-                similarity_threshold: parseFloat(similarity_threshold.toString())
+                similarity_threshold: parseFloat(similarity_threshold.toString()),
+                incremental: ['true', 'on', '1'].includes(String(this.request.body.incremental))
             };
             
-            console.log('[Phosphorus] Calling async task API with data:', taskData);
+            // 加入查重队列，由调度器在并发名额内提交到 Phosphorus
+            const jobId = await enqueuePlagiarismJob(taskData, JOB_PRIORITY.manual, this.user._id);
+            const status = await fetchTaskStatus(jobId.toHexString());
+            logger.debug('Task queued, showing waiting page', { job_id: jobId.toHexString(), queue_position: status.queue_position });
             
-            // 使用新的异步任务接口
-            const result = await makeApiRequest('/api/v1/contest/plagiarism/problems/async', 'POST', taskData);
-            
-            console.log('[Phosphorus] Async task API result:', result);
-            
-            if (result.success) {
-                // 成功创建任务，立即重定向到等待页面
-                const taskInfo = result.data;
-                console.log('[Phosphorus] Task created successfully, showing waiting page');
-                
-                // 使用现有的 task_submitted.html 模板显示等待页面
-                this.response.template = 'task_submitted.html';
-                this.response.body = {
-                    contest_id: contest_id.toString(),
-                    contest_name: contest?.title || '未知比赛',
-                    problem_count: problem_ids.length,
-                    min_tokens: parseInt(min_tokens.toString()),
-                    similarity_threshold: Math.round(parseFloat(similarity_threshold.toString()) * 100),
-                    task_id: taskInfo.task_id,
-                    estimated_time: `${Math.ceil((taskInfo.problem_count || 1) * 2)} 分钟`,
-                    success: true
-                };
-                
-            } else {
-                throw new Error(result.message || '创建查重任务失败');
-            }
+            // 使用现有的 task_submitted.html 模板显示等待页面
+            this.response.template = 'task_submitted.html';
+            this.response.body = {
+                contest_id: contest_id.toString(),
+                contest_name: contest?.title || '未知比赛',
+                problem_count: problem_ids.length,
+                min_tokens: taskData.min_tokens,
+                similarity_threshold: Math.round(taskData.similarity_threshold * 100),
+                task_id: jobId.toHexString(),
+                queue_position: status.queue_position || null,
+                // 队列预计时间已包含本任务自身的运行轮次
+                estimated_time: status.estimated_remaining
+                    ? `${Math.ceil(status.estimated_remaining / 60)} 分钟`
+                    : `${Math.ceil(problem_ids.length * 2)} 分钟`,
+                success: true
+            };
             
         } catch (error: any) {
-            console.error('[Phosphorus] Error in task creation:', error);
+            logger.error('Error in task creation', error);
             
             // 重新显示表单，包含错误信息
             const contests = await this.getAllContests();
@@ -1216,7 +2278,7 @@ class NewPlagiarismTaskHandler extends Handler {
                 status: this.getContestStatus(doc)
             }));
         } catch (error) {
-            console.error('Failed to get contests:', error);
+            logger.error('Failed to get contests', error);
             return [];
         }
     }
@@ -1242,26 +2304,7 @@ class NewPlagiarismTaskHandler extends Handler {
     // 新增：根据比赛ID获取比赛信息
     private async getContestById(contestId: string): Promise<any | null> {
         try {
-            // 使用灵活的查询方式查找比赛文档
-            let contestDoc: any = null;
-            
-            try {
-                contestDoc = await db.collection('document').findOne({ 
-                    _id: contestId,
-                    docType: 30 
-                });
-            } catch (error) {
-                // 查询失败，继续尝试其他方式
-            }
-            
-            if (!contestDoc) {
-                try {
-                    const allContests = await db.collection('document').find({ docType: 30 }).toArray();
-                    contestDoc = allContests.find(c => c._id.toString() === contestId.toString()) || null;
-                } catch (error) {
-                    // 查询失败
-                }
-            }
+            const contestDoc = await findContestDocument(contestId, this.args.domainId);
             
             if (!contestDoc) {
                 return null;
@@ -1287,7 +2330,7 @@ class NewPlagiarismTaskHandler extends Handler {
                 status: this.getContestStatus(contestDoc)
             };
         } catch (error) {
-            console.error('Failed to get contest by ID:', error);
+            logger.error('Failed to get contest by ID', error);
             return null;
         }
     }
@@ -1309,30 +2352,772 @@ class NewPlagiarismTaskHandler extends Handler {
 /**
  * Task Status Handler - /plagiarism/api/task/:task_id/status
  */
+// 已处理完成回调的任务，避免轮询与推送重复触发缓存失效和摘要计算
+const completedTasks = new Set<string>();
+const COMPLETED_TASKS_MAX = 1000;
+
+interface TaskStatus {
+    task_id: string;
+    status: string;
+    progress: number;
+    message: string;
+    completed: boolean;
+    result_url: string | null;
+    estimated_remaining: number | null;
+    queue_position?: number;
+}
+
+/**
+ * 任务完成后使缓存失效并物化比赛摘要（每个任务只执行一次）
+ */
+function handleTaskCompleted(taskId: string, contestId: any) {
+    if (completedTasks.has(taskId)) return;
+    completedTasks.add(taskId);
+    if (completedTasks.size > COMPLETED_TASKS_MAX) {
+        completedTasks.delete(completedTasks.values().next().value);
+    }
+    
+    invalidateResponseCache(contestId);
+    if (contestId) {
+        materializeContestSummaries(contestId.toString()).catch((error) => {
+            logger.warn('Failed to materialize summaries', error);
+        });
+    }
+}
+
+/**
+ * 查询 Phosphorus 任务状态并整理为页面使用的格式
+ */
+async function fetchUpstreamTaskStatus(taskId: string): Promise<TaskStatus> {
+    const result = await makeApiRequest(`/api/v1/task/${taskId}/status`, 'GET');
+    
+    // 任务完成后，缓存的结果已过期
+    if (result.completed) {
+        handleTaskCompleted(taskId, result.contest_id);
+    }
+    
+    return {
+        task_id: taskId,
+        status: result.status || 'unknown',
+        progress: result.progress || 0,
+        message: result.message || '',
+        completed: result.completed || false,
+        result_url: result.completed ? `/plagiarism/contest/${result.contest_id}` : null,
+        estimated_remaining: result.estimated_remaining || null
+    };
+}
+
+/**
+ * 任务是否已结束（完成或失败），结束后不再需要轮询
+ */
+function isTerminalTaskStatus(status: TaskStatus): boolean {
+    return status.completed || status.status === 'failed';
+}
+
+// 查重任务队列：按 max_concurrent_checks 限制同时提交到 Phosphorus 的任务数
+const QUEUE_COLLECTION = 'plagiarism_queue';
+const QUEUE_DISPATCH_INTERVAL_MS = 10000;
+// 调度锁单独存放，不与任务文档混在同一集合中
+const QUEUE_LOCK_COLLECTION = 'plagiarism_locks';
+const QUEUE_DISPATCH_LOCK_ID = 'queue_dispatcher';
+// 调度锁与 starting 任务的租期，多进程部署时同一时刻只有一个进程在调度；
+// 持有期间按续租间隔延长，进程退出后最多一个租期即可被其他进程接管
+const QUEUE_LOCK_LEASE_MS = 30000;
+const QUEUE_LEASE_RENEW_MS = 10000;
+// 提交失败后的重试次数与退避间隔
+const QUEUE_MAX_ATTEMPTS = 5;
+const QUEUE_RETRY_DELAY_MS = 30000;
+// 运行超过该时长仍未完成的任务视为失败，释放并发名额
+const QUEUE_MAX_RUNTIME_MS = 6 * 60 * 60 * 1000;
+// 没有历史数据时每个任务的预估耗时
+const QUEUE_DEFAULT_JOB_DURATION_MS = 5 * 60 * 1000;
+
+// 优先级数值越小越先执行
+const JOB_PRIORITY = {
+    manual: 0,
+    scheduled: 10
+} as const;
+
+type QueueJobStatus = 'queued' | 'starting' | 'running' | 'completed' | 'failed';
+
+interface QueueJob {
+    _id: ObjectId;
+    contest_id: string;
+    problem_ids: number[];
+    min_tokens: number;
+    similarity_threshold: number;
+    priority: number;
+    status: QueueJobStatus;
+    owner: number;
+    attempts: number;
+    created_at: Date;
+    not_before?: Date;
+    lease_until?: Date;
+    started_at?: Date;
+    finished_at?: Date;
+    task_id?: string;
+    error?: string;
+    batch_id?: ObjectId;
+    /** 增量模式：只比较上次分析之后新增或重新评测的提交 */
+    incremental?: boolean;
+    /** 增量模式下实际提交的逐题增量计划 */
+    increments?: IncrementalPlan[];
+    /** 开始提交时仍在评测中的记录 ID，按题目分组（这些提交不会进入本次分析） */
+    pending_records?: Record<string, string[]>;
+    note?: string;
+}
+
+interface IncrementalPlan {
+    problem_id: number;
+    base_analysis_id: string;
+    /** 变化的评测记录 ID */
+    submission_ids: string[];
+    /** 变化提交的提交者，后端按用户组织提交时用于定位 */
+    user_ids: string[];
+    /** 相似对中可能标识变化提交的全部键（记录 ID 与用户 ID） */
+    changed_keys: string[];
+    /** 上次分析已包含、本次重新评测的提交的语言，合并提交数时扣除 */
+    rejudged_languages: string[];
+}
+
+const processId = `${process.pid}-${new ObjectId().toHexString()}`;
+let dispatching = false;
+
+function queueCollection() {
+    return (db as any).collection(QUEUE_COLLECTION);
+}
+
+function lockCollection() {
+    return (db as any).collection(QUEUE_LOCK_COLLECTION);
+}
+
+/**
+ * 定期续租匹配的文档，返回停止续租的函数。
+ * 提交请求最长可达 api.timeout × retry_attempts，续租保证期间锁与 starting 任务不会被其他进程接管。
+ */
+function keepLeaseAlive(collection: any, filter: Record<string, any>): () => void {
+    let stopped = false;
+    const timer = setInterval(() => {
+        collection.updateOne(filter, { $set: { lease_until: new Date(Date.now() + QUEUE_LOCK_LEASE_MS) } })
+            .then((result: any) => {
+                // 停止续租前任务状态可能刚刚更新，此时未匹配属于正常情况
+                if (result.matchedCount === 0 && !stopped) {
+                    logger.warn('Queue lease lost before renewal', { filter });
+                }
+            })
+            .catch((error: any) => logger.warn('Failed to renew queue lease', { filter, error: error.message }));
+    }, QUEUE_LEASE_RENEW_MS);
+    return () => {
+        stopped = true;
+        clearInterval(timer);
+    };
+}
+
+/**
+ * 将查重任务加入队列，返回队列任务ID（用于等待页面查询进度）
+ */
+async function enqueuePlagiarismJob(
+    params: { contest_id: string; problem_ids: number[]; min_tokens: number; similarity_threshold: number; incremental?: boolean },
+    priority: number,
+    owner: number
+): Promise<ObjectId> {
+    const _id = new ObjectId();
+    await queueCollection().insertOne({
+        _id,
+        ...params,
+        priority,
+        status: 'queued',
+        owner,
+        attempts: 0,
+        created_at: new Date()
+    });
+    setImmediate(() => dispatchQueue());
+    return _id;
+}
+
+/**
+ * 获取调度锁（基于租期），拿不到锁说明其他进程正在调度
+ */
+async function acquireDispatchLock(): Promise<boolean> {
+    const now = new Date();
+    try {
+        const result = await lockCollection().updateOne(
+            { _id: QUEUE_DISPATCH_LOCK_ID, $or: [{ lease_until: { $lt: now } }, { owner: processId }] },
+            { $set: { owner: processId, lease_until: new Date(now.getTime() + QUEUE_LOCK_LEASE_MS) } },
+            { upsert: true }
+        );
+        return result.matchedCount > 0 || result.upsertedCount > 0;
+    } catch (error: any) {
+        // 其他进程持有未过期的锁时 upsert 会触发主键冲突
+        if (error?.code === 11000) return false;
+        throw error;
+    }
+}
+
+/**
+ * 检查运行中的任务是否已完成，并回收超时或卡在提交阶段的任务
+ */
+async function reconcileRunningJobs() {
+    const now = Date.now();
+    
+    // 提交过程中进程退出，任务停留在 starting 状态
+    await queueCollection().updateMany(
+        { status: 'starting', lease_until: { $lt: new Date(now) } },
+        { $set: { status: 'queued' }, $unset: { lease_until: '' } }
+    );
+    
+    const running: QueueJob[] = await queueCollection().find({ status: 'running' }).toArray();
+    for (const job of running) {
+        if (job.started_at && now - job.started_at.getTime() > QUEUE_MAX_RUNTIME_MS) {
+            await finishQueueJob(job._id, 'failed', '任务运行超时');
+            continue;
+        }
+        try {
+            const status = await fetchUpstreamTaskStatus(job.task_id!);
+            if (status.completed) {
+                await finishQueueJob(job._id, 'completed');
+            } else if (status.status === 'failed') {
+                await finishQueueJob(job._id, 'failed', status.message || '查重任务失败');
+            }
+        } catch (error: any) {
+            logger.debug('Failed to reconcile running job', { job_id: job._id.toHexString(), error: error.message });
+        }
+    }
+}
+
+async function finishQueueJob(jobId: ObjectId, status: 'completed' | 'failed', error?: string) {
+    const result = await queueCollection().updateOne(
+        { _id: jobId, status: 'running' },
+        { $set: { status, finished_at: new Date(), ...(error ? { error } : {}) } }
+    );
+    if (result.modifiedCount > 0) {
+        logger.info(`Queue job ${status}`, { job_id: jobId.toHexString(), error });
+        setImmediate(() => dispatchQueue());
+        if (status === 'completed') {
+            const job: QueueJob | null = await queueCollection().findOne({ _id: jobId });
+            if (job) {
+                await stampResultSnapshots(job).catch((stampError: any) => {
+                    logger.warn('Failed to record result snapshot time', { job_id: jobId.toHexString(), error: stampError });
+                });
+            }
+            if (job?.increments?.length) {
+                await mergeIncrementalResults(job).catch((mergeError: any) => {
+                    logger.error('Failed to merge incremental results', { job_id: jobId.toHexString(), error: mergeError });
+                });
+            }
+        }
+    }
+}
+
+// 变化的提交超过该数量时，增量比较的收益有限，改为完整分析
+const INCREMENTAL_MAX_CHANGED = 200;
+
+/**
+ * 为增量任务生成逐题计划：找出上次分析的提交快照之后新增或重新评测的提交。
+ * 任一题目没有历史结果、历史结果没有快照时间或变化过多时返回 null，表示需要完整分析。
+ */
+async function planIncrementalRun(job: QueueJob): Promise<IncrementalPlan[] | null> {
+    const contest = await findContestDocument(job.contest_id, undefined, { domainId: 1, docId: 1 });
+    if (!contest?.domainId) return null;
+    const results = (db as any).collection('check_plagiarism_results');
+    const records = (db as any).collection('record');
+    const plans: IncrementalPlan[] = [];
+    
+    for (const problemId of job.problem_ids) {
+        const base = await results.findOne(
+            { contest_id: job.contest_id, problem_id: problemId },
+            { sort: { created_at: -1 }, projection: { analysis_id: 1, snapshot_at: 1, pending_at_snapshot: 1 } }
+        );
+        // 没有快照时间的结果（非队列任务写入）无法确定比较过哪些提交
+        if (!base?.analysis_id || !base.snapshot_at) return null;
+        
+        // 记录的 _id 包含提交时间；judgeAt 晚于快照时间说明该提交被重新评测。
+        // 查询带上 domainId，命中 Hydro 的 (domainId, contest, pid) 记录索引
+        const cutoff = new Date(base.snapshot_at);
+        const changed = await records.find({
+            domainId: contest.domainId,
+            contest: contest.docId || contest._id,
+            pid: problemId,
+            $or: [
+                { _id: { $gt: ObjectId.createFromTime(Math.floor(cutoff.getTime() / 1000)) } },
+                { judgeAt: { $gt: cutoff } }
+            ]
+        }, { projection: { _id: 1, uid: 1, lang: 1 } }).limit(INCREMENTAL_MAX_CHANGED + 1).toArray();
+        if (changed.length > INCREMENTAL_MAX_CHANGED) return null;
+        
+        plans.push({
+            problem_id: problemId,
+            base_analysis_id: base.analysis_id,
+            submission_ids: changed.map((record: any) => record._id.toHexString()),
+            user_ids: [...new Set<string>(changed.map((record: any) => String(record.uid)))],
+            changed_keys: submissionKeys(changed),
+            rejudged_languages: rejudgedLanguages(changed, cutoff, base.pending_at_snapshot || [])
+        });
+    }
+    return plans;
+}
+
+// 尚未出评测结果的记录状态
+const PENDING_RECORD_STATUSES = [STATUS.STATUS_WAITING, STATUS.STATUS_JUDGING, STATUS.STATUS_COMPILING, STATUS.STATUS_FETCHED];
+
+/**
+ * 快照时间之前提交、但仍在评测中的记录，按题目分组。后端只读取已出结果的提交，
+ * 这些记录不在本次分析中，下一次增量分析需要把它们当作新增提交。
+ */
+async function findPendingRecords(job: QueueJob, snapshotAt: Date): Promise<Record<string, string[]>> {
+    const contest = await findContestDocument(job.contest_id, undefined, { domainId: 1, docId: 1 });
+    if (!contest?.domainId) return {};
+    const pending: Record<string, string[]> = {};
+    const cursor = (db as any).collection('record').find({
+        domainId: contest.domainId,
+        contest: contest.docId || contest._id,
+        pid: { $in: job.problem_ids },
+        // 与 rejudgedLanguages 一致按秒比较：同一秒内提交的记录也计入
+        _id: { $lt: ObjectId.createFromTime(Math.floor(snapshotAt.getTime() / 1000) + 1) },
+        status: { $in: PENDING_RECORD_STATUSES }
+    }, { projection: { _id: 1, pid: 1 } });
+    for await (const record of cursor) {
+        (pending[String(record.pid)] ||= []).push(record._id.toHexString());
+    }
+    return pending;
+}
+
+/**
+ * 为任务写入的结果记录提交快照时间 snapshot_at（任务开始提交时记录的 started_at）。
+ * 后端在收到任务之后才读取提交，快照时间之后变化的提交一定没有被本次分析比较过；
+ * 结果写入时间 created_at 晚于后端读取提交的时间，不能作为下一次增量分析的截止时间。
+ */
+async function stampResultSnapshots(job: QueueJob) {
+    if (!job.started_at) return;
+    const results = (db as any).collection('check_plagiarism_results');
+    const problemIds = job.increments?.length ? job.increments.map((plan) => plan.problem_id) : job.problem_ids;
+    for (const problemId of problemIds) {
+        const latest = await results.findOne(
+            { contest_id: job.contest_id, problem_id: problemId },
+            { sort: { created_at: -1 }, projection: { created_at: 1, snapshot_at: 1 } }
+        );
+        // 只标记本次任务写入的结果（写入时间不早于开始提交的时间）
+        if (!latest?.created_at || latest.snapshot_at || new Date(latest.created_at) < job.started_at) continue;
+        await results.updateOne({ _id: latest._id }, {
+            $set: {
+                snapshot_at: job.started_at,
+                pending_at_snapshot: job.pending_records?.[String(problemId)] || [],
+                queue_job_id: job._id
+            }
+        });
+    }
+}
+
+/**
+ * 将后端返回的增量结果与上次分析合并：替换变化提交的相似对，并重新计算聚类与摘要。
+ * 后端未按增量模式执行（结果中没有 base_analysis_id）时，新结果本身就是完整分析，无需合并。
+ */
+async function mergeIncrementalResults(job: QueueJob) {
+    const results = (db as any).collection('check_plagiarism_results');
+    for (const plan of job.increments || []) {
+        const delta = await results.findOne(
+            { contest_id: job.contest_id, problem_id: plan.problem_id, base_analysis_id: plan.base_analysis_id, merged_at: { $exists: false } },
+            { sort: { created_at: -1 } }
+        );
+        if (!delta) {
+            logger.debug('No incremental result to merge', { contest_id: job.contest_id, problem_id: plan.problem_id });
+            continue;
+        }
+        const base = await results.findOne({ analysis_id: plan.base_analysis_id }, {
+            projection: { high_similarity_pairs: 1, total_submissions: 1, total_comparisons: 1, submission_stats: 1, failed_submissions: 1 }
+        });
+        if (!base) continue;
+        
+        // 后端返回了实际重新比较的提交时以其为准，否则用记录 ID 与用户 ID 匹配相似对
+        const changedKeys = Array.isArray(delta.compared_submissions) && delta.compared_submissions.length
+            ? delta.compared_submissions.map(String)
+            : plan.changed_keys || plan.submission_ids;
+        const pairs = mergePairs(base.high_similarity_pairs || [], delta.high_similarity_pairs || [], changedKeys);
+        // 与完整分析使用相同的阈值；任务未指定阈值（或为 0）时使用默认阈值
+        const clusters = buildClusters(pairs, job.similarity_threshold || settings.detection.default_similarity_threshold);
+        const stats = mergeResultStats(base, delta, changedKeys, plan.rejudged_languages || []);
+        await results.updateOne(
+            { _id: delta._id },
+            { $set: { ...stats, high_similarity_pairs: pairs, clusters, merged_from: plan.base_analysis_id, merged_at: new Date() } }
+        );
+        
+        // 摘要基于合并前的增量结果生成，需要重新计算
+        await (db as any).collection('plagiarism_summaries').deleteOne({ analysis_id: delta.analysis_id });
+        await getResultSummaries([delta.analysis_id]);
+        logger.info('Merged incremental analysis', {
+            contest_id: job.contest_id,
+            problem_id: plan.problem_id,
+            analysis_id: delta.analysis_id,
+            changed_submissions: plan.submission_ids.length,
+            pairs: pairs.length
+        });
+    }
+    invalidateResponseCache(job.contest_id);
+}
+
+/**
+ * 选择下一个要执行的任务：先按优先级，同一优先级内选择运行中任务最少的比赛，
+ * 比赛内部按入队顺序（FIFO），避免单个比赛的大量任务长期占满名额。
+ */
+async function pickNextJob(runningByContest: Map<string, number>): Promise<QueueJob | null> {
+    const now = new Date();
+    const heads: { _id: { priority: number; contest_id: string }; head: QueueJob }[] = await queueCollection().aggregate([
+        { $match: { status: 'queued', $or: [{ not_before: { $exists: false } }, { not_before: { $lte: now } }] } },
+        { $sort: { priority: 1, created_at: 1 } },
+        { $group: { _id: { priority: '$priority', contest_id: '$contest_id' }, head: { $first: '$$ROOT' } } }
+    ]).toArray();
+    if (heads.length === 0) return null;
+    
+    heads.sort((a, b) => a._id.priority - b._id.priority
+        || (runningByContest.get(a._id.contest_id) || 0) - (runningByContest.get(b._id.contest_id) || 0)
+        || a.head.created_at.getTime() - b.head.created_at.getTime());
+    return heads[0].head;
+}
+
+/**
+ * 调度队列：在并发名额内按优先级与公平性提交排队任务
+ */
+async function dispatchQueue() {
+    if (dispatching) return;
+    dispatching = true;
+    let stopLockRenewal: (() => void) | null = null;
+    try {
+        if (!await acquireDispatchLock()) return;
+        stopLockRenewal = keepLeaseAlive(lockCollection(), { _id: QUEUE_DISPATCH_LOCK_ID, owner: processId });
+        await reconcileRunningJobs();
+        
+        const active: QueueJob[] = await queueCollection()
+            .find({ status: { $in: ['starting', 'running'] } }, { projection: { contest_id: 1 } })
+            .toArray();
+        const runningByContest = new Map<string, number>();
+        for (const job of active) {
+            runningByContest.set(job.contest_id, (runningByContest.get(job.contest_id) || 0) + 1);
+        }
+        
+        let slots = settings.detection.max_concurrent_checks - active.length;
+        while (slots > 0) {
+            const next = await pickNextJob(runningByContest);
+            if (!next) break;
+            
+            const claimed = await queueCollection().updateOne(
+                { _id: next._id, status: 'queued' },
+                {
+                    $set: { status: 'starting', lease_until: new Date(Date.now() + QUEUE_LOCK_LEASE_MS) },
+                    $inc: { attempts: 1 }
+                }
+            );
+            if (claimed.modifiedCount === 0) continue;
+            const job: QueueJob = { ...next, status: 'starting', attempts: next.attempts + 1 };
+            
+            slots--;
+            runningByContest.set(job.contest_id, (runningByContest.get(job.contest_id) || 0) + 1);
+            await submitQueueJob(job);
+        }
+    } catch (error: any) {
+        logger.warn('Queue dispatch failed', error);
+    } finally {
+        stopLockRenewal?.();
+        dispatching = false;
+    }
+}
+
+/**
+ * 将已认领的任务提交到 Phosphorus，失败时按退避重新排队
+ */
+async function submitQueueJob(job: QueueJob) {
+    const jobId = job._id.toHexString();
+    const stopLeaseRenewal = keepLeaseAlive(queueCollection(), { _id: job._id, status: 'starting' });
+    // 在查询变化的提交之前记录，作为本次结果的提交快照时间
+    const startedAt = new Date();
+    try {
+        const taskData: Record<string, any> = {
+            contest_id: job.contest_id,
+            problem_ids: job.problem_ids,
+            min_tokens: job.min_tokens,
+            similarity_threshold: job.similarity_threshold
+        };
+        
+        if (job.incremental) {
+            const plans = await planIncrementalRun(job);
+            if (plans) {
+                const pending = plans.filter((plan) => plan.submission_ids.length > 0);
+                if (pending.length === 0) {
+                    // 没有新增或重新评测的提交，上次结果仍然有效
+                    const now = new Date();
+                    await queueCollection().updateOne(
+                        { _id: job._id },
+                        {
+                            $set: { status: 'completed', started_at: now, finished_at: now, note: '无新增提交，沿用上次结果' },
+                            $unset: { lease_until: '' }
+                        }
+                    );
+                    logger.info('Incremental job skipped, no changed submissions', { job_id: jobId });
+                    setImmediate(() => dispatchQueue());
+                    return;
+                }
+                taskData.problem_ids = pending.map((plan) => plan.problem_id);
+                taskData.incremental = pending.map(({ problem_id, base_analysis_id, submission_ids, user_ids }) => ({
+                    problem_id, base_analysis_id, submission_ids, user_ids
+                }));
+                await queueCollection().updateOne({ _id: job._id }, { $set: { increments: pending } });
+            }
+        }
+        const pendingRecords = await findPendingRecords(job, startedAt).catch((error: any) => {
+            logger.warn('Failed to list records pending at snapshot time', { job_id: jobId, error });
+            return {};
+        });
+        logger.payload('Calling async task API', taskData, { job_id: jobId });
+        const result = await makeApiRequest('/api/v1/contest/plagiarism/problems/async', 'POST', taskData);
+        logger.payload('Async task API result', result, { job_id: jobId });
+        
+        if (!result.success || !result.data?.task_id) {
+            throw new Error(result.message || '创建查重任务失败');
+        }
+        await queueCollection().updateOne(
+            { _id: job._id },
+            {
+                $set: { status: 'running', task_id: result.data.task_id, started_at: startedAt, pending_records: pendingRecords },
+                $unset: { lease_until: '' }
+            }
+        );
+        logger.info('Queue job submitted', { job_id: jobId, task_id: result.data.task_id });
+    } catch (error: any) {
+        const exhausted = job.attempts >= QUEUE_MAX_ATTEMPTS;
+        logger.warn(`Failed to submit queue job${exhausted ? '' : ', will retry'}`, { job_id: jobId, error: error.message });
+        await queueCollection().updateOne(
+            { _id: job._id },
+            exhausted
+                ? { $set: { status: 'failed', error: error.message, finished_at: new Date() }, $unset: { lease_until: '' } }
+                : {
+                    $set: { status: 'queued', error: error.message, not_before: new Date(Date.now() + QUEUE_RETRY_DELAY_MS * job.attempts) },
+                    $unset: { lease_until: '' }
+                }
+        );
+    } finally {
+        stopLeaseRenewal();
+    }
+}
+
+/**
+ * 最近完成任务的平均耗时（毫秒），用于估算等待时间
+ */
+async function getAverageJobDuration(): Promise<number> {
+    const recent: QueueJob[] = await queueCollection()
+        .find({ status: 'completed', started_at: { $exists: true } }, { projection: { started_at: 1, finished_at: 1 } })
+        .sort({ finished_at: -1 })
+        .limit(20)
+        .toArray();
+    const durations = recent
+        .map((item) => item.finished_at!.getTime() - item.started_at!.getTime())
+        .filter((duration) => duration > 0);
+    return durations.length > 0
+        ? durations.reduce((sum, duration) => sum + duration, 0) / durations.length
+        : QUEUE_DEFAULT_JOB_DURATION_MS;
+}
+
+/**
+ * 估算排队任务的位置与剩余等待时间（秒）
+ */
+async function getQueueEstimate(job: QueueJob): Promise<{ position: number; eta: number }> {
+    const ahead = await queueCollection().countDocuments({
+        status: 'queued',
+        $or: [
+            { priority: { $lt: job.priority } },
+            { priority: job.priority, created_at: { $lt: job.created_at } }
+        ]
+    });
+    const average = await getAverageJobDuration();
+    const position = ahead + 1;
+    const rounds = Math.ceil(position / Math.max(settings.detection.max_concurrent_checks, 1));
+    return { position, eta: Math.round((rounds * average) / 1000) };
+}
+
+// 批量查重：每个批次最多展开的题目任务数
+const BATCH_MAX_JOBS = 2000;
+
+interface BatchEntry {
+    contest_id: string;
+    /** 省略时查重该比赛的全部题目 */
+    problem_ids?: number[];
+}
+
+/**
+ * 将批量请求展开为逐题任务并一次性入队。
+ * 批量任务默认使用 scheduled 优先级，手动创建的单个任务可以插队；
+ * 题目任务由队列调度器在 max_concurrent_checks 限制内执行，不同比赛之间轮流执行。
+ */
+async function enqueuePlagiarismBatch(
+    entries: BatchEntry[],
+    params: { min_tokens: number; similarity_threshold: number; incremental?: boolean },
+    priority: number,
+    owner: number
+): Promise<{ batch_id: ObjectId; job_count: number; contests: { contest_id: string; title: string; problem_count: number }[]; skipped: string[] }> {
+    const contestDocs = await findContestDocuments(entries.map((entry) => entry.contest_id), { title: 1, pids: 1 });
+    const batchId = new ObjectId();
+    const createdAt = new Date();
+    const jobs: Omit<QueueJob, '_id'>[] = [];
+    const contests: { contest_id: string; title: string; problem_count: number }[] = [];
+    const skipped: string[] = [];
+    const seen = new Set<string>();
+    
+    for (const entry of entries) {
+        const contest = contestDocs.get(entry.contest_id);
+        if (!contest || seen.has(entry.contest_id)) {
+            if (!contest) skipped.push(entry.contest_id);
+            continue;
+        }
+        seen.add(entry.contest_id);
+        
+        const problemIds = (entry.problem_ids?.length ? entry.problem_ids : contest.pids || [])
+            .map((id: any) => parseInt(id.toString()))
+            .filter((id: number) => !isNaN(id));
+        for (const problemId of problemIds) {
+            jobs.push({
+                contest_id: entry.contest_id,
+                problem_ids: [problemId],
+                min_tokens: params.min_tokens,
+                similarity_threshold: params.similarity_threshold,
+                incremental: !!params.incremental,
+                priority,
+                status: 'queued',
+                owner,
+                attempts: 0,
+                // 同一批次内保持提交顺序，保证比赛内部 FIFO
+                created_at: new Date(createdAt.getTime() + jobs.length),
+                batch_id: batchId
+            });
+        }
+        contests.push({ contest_id: entry.contest_id, title: contest.title || entry.contest_id, problem_count: problemIds.length });
+    }
+    
+    if (jobs.length === 0) {
+        throw new Error('所选比赛中没有可查重的题目');
+    }
+    if (jobs.length > BATCH_MAX_JOBS) {
+        throw new Error(`单个批次最多包含 ${BATCH_MAX_JOBS} 个题目，当前为 ${jobs.length} 个`);
+    }
+    
+    await queueCollection().insertMany(jobs, { ordered: false });
+    setImmediate(() => dispatchQueue());
+    return { batch_id: batchId, job_count: jobs.length, contests, skipped };
+}
+
+interface BatchProgress {
+    batch_id: string;
+    total: number;
+    queued: number;
+    running: number;
+    completed: number;
+    failed: number;
+    progress: number;
+    finished: boolean;
+    estimated_remaining: number | null;
+    contests: { contest_id: string; total: number; completed: number; failed: number; result_url: string }[];
+}
+
+/**
+ * 汇总批次内各题目任务的状态
+ */
+async function getBatchProgress(batchId: string): Promise<BatchProgress | null> {
+    if (!/^[0-9a-f]{24}$/i.test(batchId)) return null;
+    const rows: { _id: { contest_id: string; status: QueueJobStatus }; count: number }[] = await queueCollection().aggregate([
+        { $match: { batch_id: new ObjectId(batchId) } },
+        { $group: { _id: { contest_id: '$contest_id', status: '$status' }, count: { $sum: 1 } } }
+    ]).toArray();
+    if (rows.length === 0) return null;
+    
+    const totals = { queued: 0, running: 0, completed: 0, failed: 0 };
+    const byContest = new Map<string, { contest_id: string; total: number; completed: number; failed: number; result_url: string }>();
+    for (const { _id, count } of rows) {
+        const contest = byContest.get(_id.contest_id)
+            || { contest_id: _id.contest_id, total: 0, completed: 0, failed: 0, result_url: `/plagiarism/contest/${_id.contest_id}` };
+        contest.total += count;
+        if (_id.status === 'completed') contest.completed += count;
+        if (_id.status === 'failed') contest.failed += count;
+        byContest.set(_id.contest_id, contest);
+        totals[_id.status === 'starting' ? 'running' : _id.status] += count;
+    }
+    
+    const total = totals.queued + totals.running + totals.completed + totals.failed;
+    const remaining = totals.queued + totals.running;
+    let estimatedRemaining: number | null = null;
+    if (remaining > 0) {
+        const rounds = Math.ceil(remaining / Math.max(settings.detection.max_concurrent_checks, 1));
+        estimatedRemaining = Math.round((rounds * await getAverageJobDuration()) / 1000);
+    }
+    return {
+        batch_id: batchId,
+        total,
+        ...totals,
+        progress: Math.round(((totals.completed + totals.failed) / total) * 100),
+        finished: remaining === 0,
+        estimated_remaining: estimatedRemaining,
+        contests: [...byContest.values()]
+    };
+}
+
+/**
+ * 查询任务状态：队列任务ID按队列状态返回（运行中时转为查询 Phosphorus），其余视为 Phosphorus 任务ID
+ */
+async function fetchTaskStatus(taskId: string): Promise<TaskStatus> {
+    const job: QueueJob | null = ObjectId.isValid(taskId) && /^[0-9a-f]{24}$/i.test(taskId)
+        ? await queueCollection().findOne({ _id: new ObjectId(taskId) })
+        : null;
+    if (!job) {
+        return fetchUpstreamTaskStatus(taskId);
+    }
+    
+    const base: TaskStatus = {
+        task_id: taskId,
+        status: job.status,
+        progress: 0,
+        message: '',
+        completed: false,
+        result_url: null,
+        estimated_remaining: null
+    };
+    
+    if (job.status === 'queued' || job.status === 'starting') {
+        const { position, eta } = await getQueueEstimate(job);
+        return {
+            ...base,
+            status: 'queued',
+            message: job.status === 'starting' ? '正在提交到查重服务...' : `排队中，前方还有 ${position - 1} 个任务`,
+            queue_position: position,
+            estimated_remaining: eta
+        };
+    }
+    if (job.status === 'failed') {
+        return { ...base, message: job.error || '查重任务失败' };
+    }
+    if (job.status === 'completed') {
+        return { ...base, progress: 100, message: job.note || '', completed: true, result_url: `/plagiarism/contest/${job.contest_id}` };
+    }
+    
+    const status = await fetchUpstreamTaskStatus(job.task_id!);
+    if (status.completed) {
+        await finishQueueJob(job._id, 'completed');
+    } else if (status.status === 'failed') {
+        await finishQueueJob(job._id, 'failed', status.message || '查重任务失败');
+    }
+    return { ...status, task_id: taskId };
+}
+
 class TaskStatusHandler extends Handler {
     async get({ task_id }: { task_id: string }) {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
         try {
-            console.log('Checking task status for ID:', task_id);
+            logger.debug('Checking task status for ID', { task_id });
             
-            // 调用Phosphorus API检查任务状态
-            const result = await makeApiRequest(`/api/v1/task/${task_id}/status`, 'GET');
+            // 有页面正在订阅该任务时复用共享监视器的结果，否则查询 Phosphorus API
+            const status = await getTaskStatus(task_id);
             
-            this.response.body = {
-                success: true,
-                task_id: task_id,
-                status: result.status || 'unknown',
-                progress: result.progress || 0,
-                message: result.message || '',
-                completed: result.completed || false,
-                result_url: result.completed ? `/plagiarism/contest/${result.contest_id}` : null,
-                estimated_remaining: result.estimated_remaining || null
-            };
+            this.response.body = { success: true, ...status };
             this.response.type = 'application/json';
             
         } catch (error: any) {
-            console.error('Failed to check task status:', error);
+            logger.error('Failed to check task status', error);
             
             // 如果API调用失败，返回默认状态（可能任务还没有被Phosphorus处理）
             this.response.body = {
@@ -1350,6 +3135,368 @@ class TaskStatusHandler extends Handler {
     }
 }
 
+// 任务状态监视器的轮询间隔：状态变化时回到最小间隔，未变化时逐步退避，出错时加倍
+const TASK_WATCH_MIN_INTERVAL_MS = 1000;
+const TASK_WATCH_MAX_INTERVAL_MS = 15000;
+const TASK_WATCH_ERROR_MAX_INTERVAL_MS = 30000;
+const TASK_WATCH_BACKOFF = 1.5;
+
+type TaskStatusListener = (status: TaskStatus | null, error?: Error) => void;
+
+/**
+ * 单个任务的共享状态监视器：无论有多少订阅者，每个间隔最多向后端查询一次。
+ * 任务ID可以是队列任务ID，排队期间只查询队列集合。
+ */
+class TaskStatusWatcher {
+    listeners = new Set<TaskStatusListener>();
+    last: TaskStatus | null = null;
+    lastFetchedAt = 0;
+    interval = TASK_WATCH_MIN_INTERVAL_MS;
+    polls = 0;
+    private timer: NodeJS.Timeout | null = null;
+    private stopped = false;
+    
+    constructor(private taskId: string, private onStop: () => void) {}
+    
+    subscribe(listener: TaskStatusListener): () => void {
+        this.listeners.add(listener);
+        if (this.last) {
+            listener(this.last);
+        }
+        if (!this.timer && !this.stopped && this.listeners.size === 1) {
+            this.poll();
+        }
+        return () => {
+            this.listeners.delete(listener);
+            if (this.listeners.size === 0) {
+                this.stop();
+            }
+        };
+    }
+    
+    private async poll() {
+        this.timer = null;
+        if (this.stopped) return;
+        this.polls++;
+        
+        try {
+            const status = await fetchTaskStatus(this.taskId);
+            const changed = !this.last || this.last.status !== status.status
+                || this.last.progress !== status.progress || this.last.message !== status.message
+                || this.last.completed !== status.completed;
+            this.last = status;
+            this.lastFetchedAt = Date.now();
+            this.interval = changed
+                ? TASK_WATCH_MIN_INTERVAL_MS
+                : Math.min(this.interval * TASK_WATCH_BACKOFF, TASK_WATCH_MAX_INTERVAL_MS);
+            this.emit(status);
+            if (isTerminalTaskStatus(status)) {
+                this.stop();
+                return;
+            }
+        } catch (error: any) {
+            this.interval = Math.min(this.interval * 2, TASK_WATCH_ERROR_MAX_INTERVAL_MS);
+            this.emit(null, error);
+        }
+        
+        if (!this.stopped) {
+            this.timer = setTimeout(() => this.poll(), this.interval);
+        }
+    }
+    
+    private emit(status: TaskStatus | null, error?: Error) {
+        for (const listener of [...this.listeners]) {
+            try {
+                listener(status, error);
+            } catch (listenerError: any) {
+                logger.warn('Task status listener failed', listenerError);
+            }
+        }
+    }
+    
+    stop() {
+        if (this.stopped) return;
+        this.stopped = true;
+        if (this.timer) clearTimeout(this.timer);
+        this.timer = null;
+        this.onStop();
+    }
+}
+
+// 正在被订阅的任务状态监视器
+const taskWatchers = new Map<string, TaskStatusWatcher>();
+
+/**
+ * 订阅任务状态，返回取消订阅函数。
+ * 同一任务的所有订阅者共享一个监视器，最后一个订阅者离开或任务完成时停止轮询。
+ */
+function watchTaskStatus(taskId: string, listener: TaskStatusListener): () => void {
+    let watcher = taskWatchers.get(taskId);
+    if (!watcher) {
+        const created = new TaskStatusWatcher(taskId, () => {
+            if (taskWatchers.get(taskId) === created) {
+                taskWatchers.delete(taskId);
+            }
+        });
+        taskWatchers.set(taskId, created);
+        watcher = created;
+    }
+    return watcher.subscribe(listener);
+}
+
+/**
+ * 获取任务状态：若监视器刚刚查询过，直接复用其结果
+ */
+async function getTaskStatus(taskId: string): Promise<TaskStatus> {
+    const watcher = taskWatchers.get(taskId);
+    if (watcher?.last && Date.now() - watcher.lastFetchedAt < watcher.interval) {
+        return watcher.last;
+    }
+    return fetchTaskStatus(taskId);
+}
+
+// 任务进度推送参数
+const TASK_EVENTS_HEARTBEAT_MS = 15000;
+const TASK_EVENTS_RETRY_MS = 3000;
+// 单个连接的最长保持时间，到期后由 EventSource 自动重连
+const TASK_EVENTS_MAX_DURATION_MS = 60 * 60 * 1000;
+
+/**
+ * 为处理器打开一个 text/event-stream 响应。
+ * 客户端断开、流出错或超过最长保持时间时自动关闭并执行 onClose 注册的清理函数。
+ */
+function openEventStream(handler: Handler) {
+    const stream = new PassThrough();
+    const cleanups: (() => void)[] = [];
+    let eventId = 0;
+    let closed = false;
+    
+    const close = () => {
+        if (closed) return;
+        closed = true;
+        clearInterval(heartbeat);
+        clearTimeout(maxDuration);
+        for (const cleanup of cleanups) cleanup();
+        stream.end();
+    };
+    const heartbeat = setInterval(() => {
+        if (!closed) stream.write(': heartbeat\n\n');
+    }, TASK_EVENTS_HEARTBEAT_MS);
+    const maxDuration = setTimeout(close, TASK_EVENTS_MAX_DURATION_MS);
+    
+    // 请求体读取完毕时 req 也会触发 close（Node 16+），客户端断开需监听 res
+    handler.context.res.on('close', close);
+    stream.on('error', close);
+    
+    handler.response.addHeader('Cache-Control', 'no-cache');
+    handler.response.addHeader('X-Accel-Buffering', 'no');
+    handler.response.type = 'text/event-stream';
+    handler.response.body = stream;
+    stream.write(`retry: ${TASK_EVENTS_RETRY_MS}\n\n`);
+    
+    return {
+        send(event: string, data: any) {
+            if (closed) return;
+            stream.write(`id: ${++eventId}\nevent: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+        },
+        onClose(cleanup: () => void) {
+            if (closed) cleanup();
+            else cleanups.push(cleanup);
+        },
+        close,
+        get closed() {
+            return closed;
+        }
+    };
+}
+
+/**
+ * 任务进度推送（Server-Sent Events）
+ *
+ * 状态来自共享的 TaskStatusWatcher。首个事件为完整状态，之后只在字段变化时推送变化的部分：
+ * - progress: 任务进度变化
+ * - complete: 任务完成（随后关闭连接）
+ * - failed: 任务失败（随后关闭连接）
+ * - unavailable: 暂时无法获取后端状态
+ */
+class TaskEventsHandler extends Handler {
+    async get({ task_id }: { task_id: string }) {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const events = openEventStream(this);
+        let last: Partial<TaskStatus> = {};
+        
+        const unsubscribe = watchTaskStatus(task_id, (status, error) => {
+            if (!status) {
+                logger.debug('Task status unavailable', { task_id, error: error?.message });
+                events.send('unavailable', { task_id, message: '任务正在处理中，请稍候...' });
+                return;
+            }
+            const delta: Partial<TaskStatus> = {};
+            for (const key of Object.keys(status) as (keyof TaskStatus)[]) {
+                if (status[key] !== last[key]) {
+                    (delta as any)[key] = status[key];
+                }
+            }
+            if (Object.keys(delta).length > 0) {
+                last = status;
+                events.send(status.completed ? 'complete' : status.status === 'failed' ? 'failed' : 'progress', { task_id, ...delta });
+            }
+            if (isTerminalTaskStatus(status)) {
+                // 在回调之外关闭，避免订阅过程中同步取消订阅
+                setImmediate(events.close);
+            }
+        });
+        events.onClose(unsubscribe);
+    }
+}
+
+// 批量任务进度推送间隔（只读取本地队列集合，不访问 Phosphorus）
+const BATCH_EVENTS_INTERVAL_MS = 3000;
+
+function parseBatchParams(body: any) {
+    const minTokens = parseInt(body.min_tokens ?? settings.detection.default_min_tokens);
+    const threshold = parseFloat(body.similarity_threshold ?? settings.detection.default_similarity_threshold);
+    if (isNaN(minTokens) || minTokens <= 0) {
+        throw new Error('min_tokens 无效');
+    }
+    if (isNaN(threshold) || threshold < 0 || threshold > 1) {
+        throw new Error('similarity_threshold 应在 0 到 1 之间');
+    }
+    return { min_tokens: minTokens, similarity_threshold: threshold, incremental: body.incremental === true || body.incremental === 'true' };
+}
+
+/**
+ * 批量查重接口
+ *
+ * POST /plagiarism/api/batch
+ *   { contests: [{ contest_id, problem_ids? }] } 或 { contest_ids: [...] }（查重各比赛全部题目），
+ *   可选 min_tokens / similarity_threshold / priority（manual | scheduled，默认 scheduled）/
+ *   incremental（只比较上次分析之后新增或重新评测的提交）
+ * GET /plagiarism/api/batch/:batch_id
+ *   批次汇总进度
+ */
+class PlagiarismBatchApiHandler extends Handler {
+    async get({ batch_id }: { batch_id: string }) {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const progress = await getBatchProgress(batch_id || '');
+        this.response.type = 'application/json';
+        if (!progress) {
+            this.response.status = 404;
+            this.response.body = { success: false, error: '批次不存在' };
+            return;
+        }
+        this.response.body = { success: true, ...progress };
+    }
+    
+    async post() {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        this.response.type = 'application/json';
+        
+        try {
+            const body = this.request.body || {};
+            const rawEntries: any[] = Array.isArray(body.contests)
+                ? body.contests
+                : (Array.isArray(body.contest_ids) ? body.contest_ids : [body.contest_ids]).filter(Boolean).map((id: any) => ({ contest_id: id }));
+            const entries: BatchEntry[] = rawEntries
+                .filter((entry) => entry?.contest_id)
+                .map((entry) => ({
+                    contest_id: entry.contest_id.toString().toLowerCase(),
+                    problem_ids: Array.isArray(entry.problem_ids) ? entry.problem_ids : undefined
+                }));
+            if (entries.length === 0) {
+                throw new Error('请选择至少一个比赛');
+            }
+            
+            const priority = body.priority === 'manual' ? JOB_PRIORITY.manual : JOB_PRIORITY.scheduled;
+            const batch = await enqueuePlagiarismBatch(entries, parseBatchParams(body), priority, this.user._id);
+            logger.info('Batch queued', { batch_id: batch.batch_id.toHexString(), jobs: batch.job_count, contests: batch.contests.length });
+            
+            this.response.body = {
+                success: true,
+                ...batch,
+                batch_id: batch.batch_id.toHexString(),
+                progress_url: `/plagiarism/batch?batch_id=${batch.batch_id.toHexString()}`,
+                events_url: `/plagiarism/api/batch/${batch.batch_id.toHexString()}/events`
+            };
+        } catch (error: any) {
+            logger.warn('Failed to create batch', error);
+            this.response.status = 400;
+            this.response.body = { success: false, error: error.message };
+        }
+    }
+}
+
+/**
+ * 批量任务进度推送：汇总进度变化时推送 progress，全部结束后推送 complete 并关闭
+ */
+class BatchEventsHandler extends Handler {
+    async get({ batch_id }: { batch_id: string }) {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const events = openEventStream(this);
+        let last = '';
+        let timer: NodeJS.Timeout | null = null;
+        
+        const poll = async () => {
+            try {
+                const progress = await getBatchProgress(batch_id);
+                if (!progress) {
+                    events.send('failed', { batch_id, message: '批次不存在' });
+                    events.close();
+                    return;
+                }
+                const snapshot = JSON.stringify(progress);
+                if (snapshot !== last) {
+                    last = snapshot;
+                    events.send(progress.finished ? 'complete' : 'progress', progress);
+                }
+                if (progress.finished) {
+                    events.close();
+                    return;
+                }
+            } catch (error: any) {
+                logger.debug('Failed to load batch progress', { batch_id, error: error.message });
+            }
+            if (!events.closed) timer = setTimeout(poll, BATCH_EVENTS_INTERVAL_MS);
+        };
+        events.onClose(() => {
+            if (timer) clearTimeout(timer);
+        });
+        poll();
+    }
+}
+
+/**
+ * 批量查重页面 - /plagiarism/batch
+ */
+class PlagiarismBatchHandler extends Handler {
+    async get() {
+        this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
+        
+        const contests = await db.collection('document')
+            .find({ docType: DOC_TYPE_CONTEST }, { projection: { title: 1, beginAt: 1, pids: 1 } })
+            .sort({ beginAt: -1 })
+            .limit(200)
+            .toArray();
+        
+        this.response.template = 'batch_task.html';
+        this.response.body = {
+            contests: contests.map((doc: any) => ({
+                id: doc._id.toString(),
+                title: doc.title || `比赛 ${doc._id}`,
+                begin_at: doc.beginAt ? new Date(doc.beginAt).toLocaleDateString('zh-CN') : null,
+                problem_count: (doc.pids || []).length
+            })),
+            batch_id: /^[0-9a-f]{24}$/i.test(this.request.query.batch_id as string || '') ? this.request.query.batch_id : null,
+            default_min_tokens: settings.detection.default_min_tokens,
+            default_similarity_threshold: Math.round(settings.detection.default_similarity_threshold * 100),
+            max_concurrent_checks: settings.detection.max_concurrent_checks
+        };
+    }
+}
+
 /**
  * Enhanced Problem Detail Handler - /plagiarism/enhanced/contest/{contest_id}/problem/{problem_id}
  */
@@ -1369,7 +3516,7 @@ class EnhancedProblemDetailHandler extends Handler {
                 problem_id: parseInt(problem_id)
             };
         } catch (error: any) {
-            console.error('[Enhanced Problem Detail] Error:', error);
+            enhancedLogger.error('Problem detail error', error);
             
             if (error.message.includes('404')) {
                 throw new NotFoundError('Problem plagiarism data not found');
@@ -1393,7 +3540,7 @@ class EnhancedProblemDetailHandler extends Handler {
             );
             return response.data;
         } catch (error) {
-            console.error(`[Enhanced Problem Data] Failed to get data for ${contest_id}/${problem_id}:`, error);
+            enhancedLogger.error(`Failed to get data for ${contest_id}/${problem_id}`, error);
             throw error;
         }
     }
@@ -1408,7 +3555,7 @@ class EnhancedProblemDetailHandler extends Handler {
                 description: `Enhanced analysis for problem ${problem_id} in contest ${contest_id}`
             };
         } catch (error) {
-            console.error('[Enhanced Problem Info] Failed to get problem info:', error);
+            enhancedLogger.error('Failed to get problem info', error);
             return {
                 id: problem_id,
                 title: `Problem ${problem_id}`,
@@ -1418,23 +3565,39 @@ class EnhancedProblemDetailHandler extends Handler {
     }
 }
 
+// 需要解析 JSON 的代理接口（结果可缓存、体积较小），其余接口直接流式透传
+const PROXY_BUFFERED_ENDPOINTS: RegExp[] = [
+    /^problem\//
+];
+
+// 透传给客户端的上游响应头
+const PROXY_PASSTHROUGH_HEADERS = ['content-type', 'content-encoding', 'content-length', 'etag', 'last-modified'];
+
 /**
  * Enhanced API Proxy Handler for real-time features
+ *
+ * 默认将上游的状态码、响应头和响应体直接以流的形式转发给客户端（由 Koa 处理背压），
+ * 只有 PROXY_BUFFERED_ENDPOINTS 中的接口才经过 makeEnhancedApiRequest 解析与缓存。
  */
 class EnhancedApiProxyHandler extends Handler {
     async get(domainId: string, ...args: string[]) {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
-        const endpoint = args.join('/');
+        const endpoint = this.getProxyEndpoint(args);
         const queryParams = new URLSearchParams(this.request.query as any).toString();
         const fullEndpoint = queryParams ? `${endpoint}?${queryParams}` : endpoint;
         
         try {
-            const response = await makeEnhancedApiRequest(`/api/v1/jplag/enhanced/${fullEndpoint}`);
-            this.response.body = response;
-            this.response.type = 'application/json';
+            if (PROXY_BUFFERED_ENDPOINTS.some((pattern) => pattern.test(endpoint))) {
+                const response = await makeEnhancedApiRequest(`/api/v1/jplag/enhanced/${fullEndpoint}`);
+                // 缓存的数据已冻结，响应体使用浅拷贝
+                this.response.body = { ...response };
+                this.response.type = 'application/json';
+                return;
+            }
+            await this.streamUpstream(`/api/v1/jplag/enhanced/${fullEndpoint}`, 'GET');
         } catch (error: any) {
-            console.error('[Enhanced API Proxy] Error:', error);
+            enhancedLogger.error('Proxy request failed', error);
             this.response.status = 500;
             this.response.body = { error: error.message };
             this.response.type = 'application/json';
@@ -1444,37 +3607,153 @@ class EnhancedApiProxyHandler extends Handler {
     async post(domainId: string, ...args: string[]) {
         this.checkPriv(PRIV.PRIV_EDIT_SYSTEM);
         
-        const endpoint = args.join('/');
+        const endpoint = this.getProxyEndpoint(args);
         
         try {
-            const response = await makeEnhancedApiRequest(
-                `/api/v1/jplag/enhanced/${endpoint}`,
-                'POST',
-                this.request.body
-            );
-            this.response.body = response;
-            this.response.type = 'application/json';
+            await this.streamUpstream(`/api/v1/jplag/enhanced/${endpoint}`, 'POST', this.request.body);
         } catch (error: any) {
-            console.error('[Enhanced API Proxy POST] Error:', error);
+            enhancedLogger.error('Proxy POST request failed', error);
             this.response.status = 500;
             this.response.body = { error: error.message };
             this.response.type = 'application/json';
         }
     }
+    
+    /**
+     * 取路由通配段（* 匹配的部分）作为上游接口路径，不从请求路径中截取，
+     * 因此在 /d/:domainId 前缀的路由下同样正确
+     */
+    private getProxyEndpoint(args: string[]): string {
+        const wildcard = (this.args as any)?.[0] ?? (this.request as any).params?.[0];
+        if (typeof wildcard === 'string') {
+            return wildcard.replace(/^\/+/, '');
+        }
+        return args.filter((arg) => typeof arg === 'string').join('/');
+    }
+    
+    private async streamUpstream(endpoint: string, method: string, data?: any) {
+        const headers: Record<string, string> = {
+            'Content-Type': 'application/json',
+            'X-API-Version': '2.0',
+            'X-Client': 'hydro-enhanced-plugin'
+        };
+        // 透传压缩编码时，只请求客户端能够解码的编码
+        const acceptEncoding = this.request.headers['accept-encoding'];
+        if (acceptEncoding) {
+            headers['Accept-Encoding'] = acceptEncoding;
+        }
+        
+        const upstream = await openPhosphorusStream(`${getPhosphorusApiBase()}${endpoint}`, {
+            method,
+            headers,
+            body: data && method !== 'GET' ? JSON.stringify(data) : undefined
+        });
+        
+        this.response.status = upstream.statusCode || 502;
+        for (const name of PROXY_PASSTHROUGH_HEADERS) {
+            const value = upstream.headers[name];
+            if (value !== undefined) {
+                this.response.addHeader(name, Array.isArray(value) ? value.join(', ') : value);
+            }
+        }
+        // 上游按转发的 Accept-Encoding 选择编码，透传的响应体随之变化
+        this.response.addHeader('Vary', 'Accept-Encoding');
+        this.response.type = upstream.headers['content-type'] || 'application/json';
+        this.response.body = upstream;
+    }
+}
+
+// 插件响应压缩统计
+const compressionStats = {
+    responses: 0,
+    streams: 0,
+    bytes_in: 0,
+    bytes_out: 0,
+    // 到达本层时仍为对象、由本层序列化的 JSON 响应体
+    serialized: 0
+};
+
+/**
+ * 插件页面与接口的响应压缩中间件。
+ * 按 Accept-Encoding 协商 br/gzip/deflate，小于阈值（settings.compression.threshold）的响应不压缩；
+ * 已带 Content-Encoding 的响应（如代理透传的上游压缩体）保持原样。
+ *
+ * JSON 接口（/plagiarism/api/*、/pairs 等）的响应体在这里仍是对象，本层按 Koa 的方式序列化后再压缩；
+ * 页面已由 Hydro 渲染为字符串。其他对象响应体保持原样。
+ */
+async function compressionLayer(ctx: any, next: () => Promise<void>) {
+    await next();
+    
+    if (!ctx.path.startsWith('/plagiarism') || ctx.method === 'HEAD') return;
+    if (ctx.body == null || ctx.status === 204 || ctx.status === 304) return;
+    if (ctx.response.get('Content-Encoding')) return;
+    
+    let body = ctx.body;
+    if (!isCompressibleType(ctx.response.type)) return;
+    if (!(body instanceof Stream) && !Buffer.isBuffer(body) && typeof body !== 'string') {
+        if (typeof body !== 'object' || !/json/i.test(ctx.response.type)) return;
+        body = JSON.stringify(body);
+        compressionStats.serialized++;
+    }
+    
+    ctx.vary('Accept-Encoding');
+    const encoding = negotiateEncoding(ctx.get('Accept-Encoding'));
+    if (!encoding) return;
+    
+    if (body instanceof Stream) {
+        compressionStats.streams++;
+        ctx.remove('Content-Length');
+        ctx.set('Content-Encoding', encoding);
+        const encoder = createEncoder(encoding);
+        body.on('error', (error: Error) => encoder.destroy(error));
+        ctx.body = (body as Readable).pipe(encoder);
+        return;
+    }
+    
+    const buffer = Buffer.isBuffer(body) ? body : Buffer.from(body);
+    if (buffer.length < settings.compression.threshold) return;
+    
+    const compressed = await compressBuffer(buffer, encoding);
+    compressionStats.responses++;
+    compressionStats.bytes_in += buffer.length;
+    compressionStats.bytes_out += compressed.length;
+    ctx.set('Content-Encoding', encoding);
+    ctx.body = compressed;
 }
 
 export default definePlugin({
     name: PLUGIN_NAME,
     
     apply(ctx: Context) {
+        // 加载插件设置，phosphorus.* 系统设置变化时刷新
+        fileConfig = readFileConfig();
+        refreshSettings();
+        const settingKeys = new Set<string>(Object.values(SYSTEM_SETTING_KEYS));
+        ctx.on('system/setting', (args: Record<string, any>) => {
+            if (Object.keys(args || {}).some((key) => settingKeys.has(key))) {
+                refreshSettings();
+                logger.info('Plugin settings reloaded');
+            }
+        });
+        
         // Register original routes
         ctx.Route('plagiarism_main', '/plagiarism', PlagiarismMainHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_contest_list', '/plagiarism/contest', ContestPlagiarismListHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_contest_detail', '/plagiarism/contest/:contest_id', ContestPlagiarismDetailHandler, PRIV.PRIV_EDIT_SYSTEM);
+        // 导出路由需在题目详情路由之前注册，避免 download 被当作 problem_id
+        ctx.Route('plagiarism_contest_export', '/plagiarism/contest/:contest_id/download', PlagiarismExportHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_problem_export', '/plagiarism/contest/:contest_id/:problem_id/download', PlagiarismExportHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_problem_detail', '/plagiarism/contest/:contest_id/:problem_id', ProblemPlagiarismDetailHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_problem_pairs', '/plagiarism/contest/:contest_id/:problem_id/pairs', ProblemPairsHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_new_task', '/plagiarism/new', NewPlagiarismTaskHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_api_problems', '/plagiarism/api/problems', PlagiarismApiHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_api_metrics', '/plagiarism/api/metrics', PlagiarismMetricsHandler, PRIV.PRIV_EDIT_SYSTEM);
         ctx.Route('plagiarism_task_status', '/plagiarism/api/task/:task_id/status', TaskStatusHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_task_events', '/plagiarism/api/task/:task_id/events', TaskEventsHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_batch', '/plagiarism/batch', PlagiarismBatchHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_api_batch_create', '/plagiarism/api/batch', PlagiarismBatchApiHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_api_batch', '/plagiarism/api/batch/:batch_id', PlagiarismBatchApiHandler, PRIV.PRIV_EDIT_SYSTEM);
+        ctx.Route('plagiarism_batch_events', '/plagiarism/api/batch/:batch_id/events', BatchEventsHandler, PRIV.PRIV_EDIT_SYSTEM);
         
         // Register enhanced routes
         ctx.Route('enhanced_problem_detail', '/plagiarism/enhanced/contest/:contest_id/problem/:problem_id', EnhancedProblemDetailHandler, PRIV.PRIV_EDIT_SYSTEM);
@@ -1487,7 +3766,25 @@ export default definePlugin({
             uid: 'plagiarism_system',
         }, PRIV.PRIV_EDIT_SYSTEM);
         
-        console.log(`${PLUGIN_NAME} plugin loaded successfully`);
-        console.log('[Enhanced Routes] Registered enhanced plagiarism detection routes');
+        // 压缩插件页面与接口的响应
+        if (typeof (ctx as any).server?.addServerLayer === 'function') {
+            (ctx as any).server.addServerLayer('phosphorus_compression', compressionLayer);
+        } else {
+            logger.warn('Server layers unavailable, responses will not be compressed');
+        }
+        
+        // 定期调度查重队列（入队与任务完成时也会立即触发）
+        const queueTimer = setInterval(() => dispatchQueue(), QUEUE_DISPATCH_INTERVAL_MS);
+        ctx.on('dispose', () => clearInterval(queueTimer));
+        
+        // 创建并校验插件查询依赖的索引
+        bootstrapIndexes().then((report) => {
+            indexReport = report;
+        }).catch((error: any) => {
+            logger.error('Index bootstrap failed', error);
+        });
+        
+        logger.info(`${PLUGIN_NAME} plugin loaded successfully`);
+        enhancedLogger.info('Registered enhanced plagiarism detection routes');
     }
 });
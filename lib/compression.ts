@@ -0,0 +1,124 @@
+/**
+ * 响应压缩模块
+ *
+ * 负责 Accept-Encoding 协商、创建压缩流以及解码上游的压缩响应体。
+ * 动态内容使用较低的 brotli 质量等级，在压缩率与 CPU 开销之间取得平衡。
+ */
+
+import { Transform } from 'stream';
+import { promisify } from 'util';
+import zlib from 'zlib';
+
+export type ContentEncoding = 'br' | 'gzip' | 'deflate';
+
+/** 服务端按优先级支持的编码 */
+const SUPPORTED_ENCODINGS: ContentEncoding[] = ['br', 'gzip', 'deflate'];
+
+/** 请求上游时携带的 Accept-Encoding */
+export const UPSTREAM_ACCEPT_ENCODING = 'br, gzip, deflate';
+
+const BROTLI_QUALITY = 4;
+
+/** 不小于该字节数的响应体在线程池中异步压缩，避免阻塞事件循环 */
+export const ASYNC_COMPRESS_THRESHOLD = 64 * 1024;
+
+const BROTLI_OPTIONS = { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY } };
+
+const brotliCompress = promisify(zlib.brotliCompress);
+const gzip = promisify(zlib.gzip);
+const deflate = promisify(zlib.deflate);
+const brotliDecompress = promisify(zlib.brotliDecompress);
+const gunzip = promisify(zlib.gunzip);
+const inflate = promisify(zlib.inflate);
+
+/**
+ * 按 Accept-Encoding（含 q 值）选择编码，不支持或未声明时返回 null
+ */
+export function negotiateEncoding(header: string | string[] | undefined): ContentEncoding | null {
+    if (!header) {
+        return null;
+    }
+    const value = Array.isArray(header) ? header.join(',') : header;
+    const weights = new Map<string, number>();
+    for (const part of value.split(',')) {
+        const [name, ...params] = part.trim().toLowerCase().split(';');
+        if (!name) {
+            continue;
+        }
+        let q = 1;
+        for (const param of params) {
+            const [key, raw] = param.trim().split('=');
+            if (key === 'q') {
+                const parsed = parseFloat(raw);
+                q = Number.isFinite(parsed) ? parsed : 0;
+            }
+        }
+        weights.set(name, q);
+    }
+
+    let best: ContentEncoding | null = null;
+    let bestWeight = 0;
+    for (const encoding of SUPPORTED_ENCODINGS) {
+        const weight = weights.get(encoding) ?? weights.get('*') ?? 0;
+        if (weight > bestWeight) {
+            best = encoding;
+            bestWeight = weight;
+        }
+    }
+    return best;
+}
+
+/**
+ * 判断内容类型是否值得压缩（文本类响应，不含事件流）
+ */
+export function isCompressibleType(contentType: string | undefined): boolean {
+    // 事件流需要逐条送达，压缩缓冲会延迟推送
+    if (!contentType || /^text\/event-stream\b/i.test(contentType)) {
+        return false;
+    }
+    return /^text\/|\/(json|x-ndjson|javascript|xml|csv)\b|\+json\b/i.test(contentType);
+}
+
+/**
+ * 创建对应编码的压缩流
+ */
+export function createEncoder(encoding: ContentEncoding): Transform {
+    if (encoding === 'br') {
+        return zlib.createBrotliCompress(BROTLI_OPTIONS);
+    }
+    if (encoding === 'gzip') {
+        return zlib.createGzip();
+    }
+    return zlib.createDeflate();
+}
+
+/**
+ * 一次性压缩缓冲区：小响应体同步压缩，大响应体（ASYNC_COMPRESS_THRESHOLD 及以上）使用异步接口
+ */
+export async function compressBuffer(body: Buffer, encoding: ContentEncoding): Promise<Buffer> {
+    const offload = body.length >= ASYNC_COMPRESS_THRESHOLD;
+    if (encoding === 'br') {
+        return offload ? brotliCompress(body, BROTLI_OPTIONS) : zlib.brotliCompressSync(body, BROTLI_OPTIONS);
+    }
+    if (encoding === 'gzip') {
+        return offload ? gzip(body) : zlib.gzipSync(body);
+    }
+    return offload ? deflate(body) : zlib.deflateSync(body);
+}
+
+/**
+ * 按 Content-Encoding 解码响应体，未压缩或未知编码时原样返回
+ */
+export async function decodeBody(body: Buffer, contentEncoding: string | undefined): Promise<Buffer> {
+    const encoding = (contentEncoding || '').trim().toLowerCase();
+    if (encoding === 'br') {
+        return brotliDecompress(body);
+    }
+    if (encoding === 'gzip' || encoding === 'x-gzip') {
+        return gunzip(body);
+    }
+    if (encoding === 'deflate') {
+        return inflate(body);
+    }
+    return body;
+}
@@ -0,0 +1,266 @@
+/**
+ * 增量查重合并模块
+ *
+ * 增量分析只比较新增 / 重新评测的提交与全部提交（new × (old ∪ new)），
+ * 这里把增量结果合并回上一次分析的相似对，并基于合并后的相似对重新计算聚类。
+ * 复杂度为 O(pairs · α(n))，不需要重新比较未变化的提交。
+ */
+
+import { defaultSimilarity } from './pair-stats';
+
+export interface MergedCluster {
+    index: number;
+    size: number;
+    average_similarity: number;
+    members: string[];
+}
+
+/** 相似对中标识两侧提交的字段：后端可能以提交 ID、用户 ID 或用户名标识一份提交 */
+const PAIR_IDENTITY_FIELDS = [
+    ['first_submission', 'second_submission'],
+    ['first_user_id', 'second_user_id'],
+    ['user1', 'user2']
+] as const;
+
+/**
+ * 取一侧提交的标识：标量直接转为字符串，对象取其中的 id / submission_id / _id
+ */
+function identity(value: any): string | undefined {
+    if (value === undefined || value === null || value === '') {
+        return undefined;
+    }
+    if (typeof value === 'object') {
+        const id = value.id ?? value.submission_id ?? value._id;
+        return id === undefined || id === null ? undefined : String(id);
+    }
+    return String(value);
+}
+
+/**
+ * 相似对两侧的标识，按 PAIR_IDENTITY_FIELDS 的顺序取第一组可用的字段
+ */
+export function pairMembers(pair: any): [string, string] | undefined {
+    for (const [firstField, secondField] of PAIR_IDENTITY_FIELDS) {
+        const first = identity(pair[firstField]);
+        const second = identity(pair[secondField]);
+        if (first !== undefined && second !== undefined) {
+            return [first, second];
+        }
+    }
+    return undefined;
+}
+
+/**
+ * 相似对涉及的全部标识（所有标识字段），用于判断相似对是否涉及变化的提交
+ */
+function pairIdentities(pair: any): string[] {
+    const identities: string[] = [];
+    for (const fields of PAIR_IDENTITY_FIELDS) {
+        for (const field of fields) {
+            const value = identity(pair[field]);
+            if (value !== undefined) identities.push(value);
+        }
+    }
+    return identities;
+}
+
+/**
+ * 变化的评测记录在相似对中可能使用的标识：记录 ID 与提交者的用户 ID
+ */
+export function submissionKeys(records: Iterable<{ _id: any; uid?: any }>): string[] {
+    const keys = new Set<string>();
+    for (const record of records) {
+        const id = identity(typeof record._id?.toHexString === 'function' ? record._id.toHexString() : record._id);
+        if (id !== undefined) keys.add(id);
+        const uid = identity(record.uid);
+        if (uid !== undefined) keys.add(uid);
+    }
+    return [...keys];
+}
+
+function pairKey(pair: any): string {
+    const [first, second] = pairMembers(pair) || [String(pair.first_submission), String(pair.second_submission)];
+    return first < second ? `${first}\u0000${second}` : `${second}\u0000${first}`;
+}
+
+/**
+ * 合并相似对：丢弃上次结果中涉及变化提交的相似对（这些提交已重新比较），
+ * 再加入增量结果中的相似对；同一对提交以增量结果为准。按相似度降序返回。
+ *
+ * @param changedSubmissions 变化提交的全部标识（见 submissionKeys），或后端返回的实际比较的提交
+ */
+export function mergePairs(basePairs: Iterable<any>, deltaPairs: Iterable<any>, changedSubmissions: Iterable<string>): any[] {
+    const changed = new Set(Array.from(changedSubmissions, String));
+    const merged = new Map<string, any>();
+
+    for (const pair of basePairs) {
+        if (pairIdentities(pair).some((id) => changed.has(id))) {
+            continue;
+        }
+        merged.set(pairKey(pair), pair);
+    }
+    for (const pair of deltaPairs) {
+        merged.set(pairKey(pair), pair);
+    }
+
+    return [...merged.values()].sort((a, b) => (defaultSimilarity(b) ?? 0) - (defaultSimilarity(a) ?? 0));
+}
+
+/**
+ * 变化的提交中，上次分析已经包含、本次被重新评测的提交的语言（每个提交一项）。
+ * 快照时间之后提交的是新增提交；快照时间之前提交、但快照时仍在评测中的提交
+ * 没有进入上次分析，同样按新增提交处理。
+ *
+ * @param pendingAtSnapshot 快照时仍在评测中的记录 ID
+ */
+export function rejudgedLanguages(
+    records: Iterable<{ _id: any; lang?: string }>, snapshotAt: Date, pendingAtSnapshot: Iterable<string>
+): string[] {
+    const pending = new Set(Array.from(pendingAtSnapshot, String));
+    const languages: string[] = [];
+    for (const record of records) {
+        const id = identity(typeof record._id?.toHexString === 'function' ? record._id.toHexString() : record._id);
+        if (id === undefined || pending.has(id)) continue;
+        if (record._id.getTimestamp() > snapshotAt) continue;
+        languages.push(String(record.lang || ''));
+    }
+    return languages;
+}
+
+export interface MergedResultStats {
+    total_submissions: number;
+    total_comparisons: number;
+    submission_stats: any;
+    failed_submissions: any[];
+}
+
+/** 按提交计数、可以累加的统计字段 */
+function isCountField(key: string): boolean {
+    return key === 'count' || key.startsWith('total_') || key.endsWith('_count');
+}
+
+/**
+ * 合并两份统计对象：计数字段相加，其余字段以增量结果为准，嵌套对象逐层合并
+ */
+function mergeCounts(base: any, delta: any): any {
+    if (!base || typeof base !== 'object' || Array.isArray(base)) return delta ?? base;
+    if (!delta || typeof delta !== 'object' || Array.isArray(delta)) return delta ?? base;
+    const merged: Record<string, any> = { ...base };
+    for (const [key, value] of Object.entries(delta)) {
+        if (typeof value === 'number' && typeof base[key] === 'number' && isCountField(key)) {
+            merged[key] = base[key] + value;
+        } else {
+            merged[key] = mergeCounts(base[key], value);
+        }
+    }
+    return merged;
+}
+
+/**
+ * 合并结果级统计：提交数与比较次数为两次分析之和，重新评测的提交在两次分析中都被计入，需要扣除一次；
+ * 失败提交保留上次结果中未变化的部分，再加入增量结果中的失败提交。
+ *
+ * @param changedKeys 变化提交的全部标识（见 submissionKeys）
+ * @param rejudgedLanguages 上次分析已包含、本次重新评测的提交的语言（每个提交一项）
+ */
+export function mergeResultStats(base: any, delta: any, changedKeys: Iterable<string>, rejudgedLanguages: string[]): MergedResultStats {
+    const changed = new Set(Array.from(changedKeys, String));
+    const rejudged = rejudgedLanguages.length;
+
+    const submissionStats = mergeCounts(base.submission_stats, delta.submission_stats);
+    if (submissionStats && typeof submissionStats === 'object') {
+        if (typeof submissionStats.total_submissions === 'number') {
+            submissionStats.total_submissions = Math.max(0, submissionStats.total_submissions - rejudged);
+        }
+        const byLanguage = submissionStats.by_language;
+        for (const language of rejudgedLanguages) {
+            // Hydro 的语言带有版本后缀（如 cc.cc17），统计中可能只记录前缀
+            const key = byLanguage?.[language] ? language : language.split('.')[0];
+            if (typeof byLanguage?.[key]?.count === 'number') {
+                byLanguage[key] = { ...byLanguage[key], count: Math.max(0, byLanguage[key].count - 1) };
+            }
+        }
+    }
+
+    const failedIdentity = (entry: any) => identity(typeof entry === 'object' && entry !== null
+        ? entry.submission_id ?? entry.id ?? entry.user_id ?? entry.user
+        : entry);
+    const failed = [
+        ...(base.failed_submissions || []).filter((entry: any) => !changed.has(failedIdentity(entry) ?? '')),
+        ...(delta.failed_submissions || [])
+    ];
+
+    return {
+        total_submissions: Math.max(0, (base.total_submissions || 0) + (delta.total_submissions || 0) - rejudged),
+        total_comparisons: (base.total_comparisons || 0) + (delta.total_comparisons || 0),
+        submission_stats: submissionStats,
+        failed_submissions: failed
+    };
+}
+
+/**
+ * 以相似度不低于阈值的相似对为边，用并查集求连通分量作为聚类（至少两个成员）。
+ * 聚类按平均相似度降序编号。
+ */
+export function buildClusters(pairs: Iterable<any>, threshold: number): MergedCluster[] {
+    const parent = new Map<string, string>();
+    const find = (node: string): string => {
+        let root = node;
+        while (parent.get(root) !== root) {
+            root = parent.get(root)!;
+        }
+        // 路径压缩
+        let current = node;
+        while (current !== root) {
+            const next = parent.get(current)!;
+            parent.set(current, root);
+            current = next;
+        }
+        return root;
+    };
+
+    const edges: { first: string; second: string; similarity: number }[] = [];
+    for (const pair of pairs) {
+        const similarity = defaultSimilarity(pair);
+        if (similarity === undefined || similarity < threshold) {
+            continue;
+        }
+        const members = pairMembers(pair);
+        if (!members) {
+            continue;
+        }
+        const [first, second] = members;
+        if (!parent.has(first)) parent.set(first, first);
+        if (!parent.has(second)) parent.set(second, second);
+        const rootFirst = find(first);
+        const rootSecond = find(second);
+        if (rootFirst !== rootSecond) {
+            parent.set(rootFirst, rootSecond);
+        }
+        edges.push({ first, second, similarity });
+    }
+
+    const groups = new Map<string, { members: string[]; sum: number; edges: number }>();
+    for (const node of parent.keys()) {
+        const root = find(node);
+        const group = groups.get(root) || { members: [], sum: 0, edges: 0 };
+        group.members.push(node);
+        groups.set(root, group);
+    }
+    for (const edge of edges) {
+        const group = groups.get(find(edge.first))!;
+        group.sum += edge.similarity;
+        group.edges++;
+    }
+
+    return [...groups.values()]
+        .filter((group) => group.members.length >= 2)
+        .map((group) => ({ members: group.members, average_similarity: group.edges > 0 ? group.sum / group.edges : 0 }))
+        .sort((a, b) => b.average_similarity - a.average_similarity)
+        .map((group, index) => ({
+            index,
+            size: group.members.length,
+            average_similarity: group.average_similarity,
+            members: group.members
+        }));
+}
@@ -0,0 +1,245 @@
+/**
+ * 结构化日志模块
+ *
+ * 按级别过滤，每条日志输出为一行 JSON，先写入内存缓冲区，再在下一轮事件循环中批量写出，
+ * 输出流出现背压时暂停写出，缓冲区满后丢弃新日志并记录丢弃数量。
+ * 请求体 / 响应体等大对象只在开启 payload 日志时按采样率记录，且序列化长度有上限，
+ * 不会对整个对象执行 JSON.stringify。
+ */
+
+import { Writable } from 'stream';
+
+export type LogLevel = 'debug' | 'info' | 'warn' | 'error' | 'silent';
+
+const LEVEL_ORDER: Record<LogLevel, number> = {
+    debug: 10,
+    info: 20,
+    warn: 30,
+    error: 40,
+    silent: 100
+};
+
+export interface LoggerOptions {
+    /** 最低输出级别，默认 info */
+    level: LogLevel;
+    /** 是否记录请求体 / 响应体，默认关闭 */
+    payloads: boolean;
+    /** payload 日志采样率 (0, 1]，默认 1 */
+    sampleRate: number;
+    /** 单个 payload 序列化后的最大字符数，默认 2048 */
+    maxPayloadChars: number;
+    /** 缓冲区最多保留的日志条数，默认 1000 */
+    maxBuffered: number;
+}
+
+const DEFAULT_OPTIONS: LoggerOptions = {
+    level: 'info',
+    payloads: false,
+    sampleRate: 1,
+    maxPayloadChars: 2048,
+    maxBuffered: 1000
+};
+
+export function isLogLevel(value: any): value is LogLevel {
+    return typeof value === 'string' && value in LEVEL_ORDER;
+}
+
+/**
+ * 在字符预算内序列化任意值，超出预算的部分以省略标记代替
+ */
+export function serializeBounded(value: any, maxChars: number): string {
+    let budget = maxChars;
+    const seen = new WeakSet<object>();
+
+    const write = (item: any, depth: number): string => {
+        if (budget <= 0) {
+            return '…';
+        }
+        if (item === null || item === undefined || typeof item === 'number' || typeof item === 'boolean') {
+            const text = String(item);
+            budget -= text.length;
+            return text;
+        }
+        if (typeof item === 'string') {
+            const text = item.length > budget ? `${JSON.stringify(item.slice(0, Math.max(budget, 0)))}…` : JSON.stringify(item);
+            budget -= text.length;
+            return text;
+        }
+        if (typeof item !== 'object') {
+            const text = String(item);
+            budget -= text.length;
+            return text;
+        }
+        if (item instanceof Date) {
+            const text = item.toISOString();
+            budget -= text.length;
+            return text;
+        }
+        if (seen.has(item) || depth > 8) {
+            budget -= 3;
+            return '[…]';
+        }
+        seen.add(item);
+        if (typeof item.toHexString === 'function') {
+            const text = item.toHexString();
+            budget -= text.length;
+            return text;
+        }
+
+        const parts: string[] = [];
+        if (Array.isArray(item)) {
+            budget -= 2;
+            for (let i = 0; i < item.length; i++) {
+                if (budget <= 0) {
+                    parts.push(`…(+${item.length - i} more)`);
+                    break;
+                }
+                parts.push(write(item[i], depth + 1));
+            }
+            return `[${parts.join(',')}]`;
+        }
+
+        const keys = Object.keys(item);
+        budget -= 2;
+        for (let i = 0; i < keys.length; i++) {
+            if (budget <= 0) {
+                parts.push(`…(+${keys.length - i} keys)`);
+                break;
+            }
+            budget -= keys[i].length + 3;
+            parts.push(`${JSON.stringify(keys[i])}:${write(item[keys[i]], depth + 1)}`);
+        }
+        return `{${parts.join(',')}}`;
+    };
+
+    return write(value, 0);
+}
+
+function serializeError(error: any) {
+    if (error instanceof Error) {
+        return { name: error.name, message: error.message, stack: error.stack };
+    }
+    return error;
+}
+
+export class StructuredLogger {
+    private options: LoggerOptions = { ...DEFAULT_OPTIONS };
+    private buffer: { line: string; error: boolean }[] = [];
+    private flushScheduled = false;
+    private waitingForDrain = false;
+    private dropped = 0;
+
+    constructor(
+        private scope: string,
+        private stdout: Writable = process.stdout,
+        private stderr: Writable = process.stderr
+    ) {
+        process.once('beforeExit', () => this.flush());
+    }
+
+    configure(options: Partial<LoggerOptions>) {
+        this.options = { ...this.options, ...options };
+    }
+
+    isEnabled(level: LogLevel): boolean {
+        return LEVEL_ORDER[level] >= LEVEL_ORDER[this.options.level];
+    }
+
+    debug(msg: string, fields?: Record<string, any>) {
+        this.log('debug', msg, fields);
+    }
+
+    info(msg: string, fields?: Record<string, any>) {
+        this.log('info', msg, fields);
+    }
+
+    warn(msg: string, fields?: Record<string, any> | Error) {
+        this.log('warn', msg, fields instanceof Error ? { error: fields } : fields);
+    }
+
+    error(msg: string, fields?: Record<string, any> | Error) {
+        this.log('error', msg, fields instanceof Error ? { error: fields } : fields);
+    }
+
+    /**
+     * 记录请求体 / 响应体（debug 级别），需开启 payloads 并命中采样
+     */
+    payload(msg: string, data: any, fields?: Record<string, any>) {
+        if (!this.options.payloads || !this.isEnabled('debug')) {
+            return;
+        }
+        if (this.options.sampleRate < 1 && Math.random() >= this.options.sampleRate) {
+            return;
+        }
+        this.log('debug', msg, { ...fields, payload: serializeBounded(data, this.options.maxPayloadChars) });
+    }
+
+    log(level: LogLevel, msg: string, fields?: Record<string, any>) {
+        if (level === 'silent' || !this.isEnabled(level)) {
+            return;
+        }
+        if (this.buffer.length >= this.options.maxBuffered) {
+            this.dropped++;
+            return;
+        }
+
+        const entry: Record<string, any> = { time: new Date().toISOString(), level, scope: this.scope, msg };
+        if (fields) {
+            for (const key of Object.keys(fields)) {
+                entry[key] = key === 'error' ? serializeError(fields[key]) : fields[key];
+            }
+        }
+        let line: string;
+        try {
+            line = JSON.stringify(entry);
+        } catch {
+            // 字段中包含循环引用或 BigInt 等无法直接序列化的值
+            line = JSON.stringify({
+                time: entry.time, level, scope: this.scope, msg,
+                fields: serializeBounded(fields, this.options.maxPayloadChars)
+            });
+        }
+        this.buffer.push({ line, error: LEVEL_ORDER[level] >= LEVEL_ORDER.warn });
+        this.scheduleFlush();
+    }
+
+    /**
+     * 立即写出缓冲区中的日志
+     */
+    flush() {
+        this.flushScheduled = false;
+        if (this.dropped > 0) {
+            const dropped = this.dropped;
+            this.dropped = 0;
+            this.buffer.push({
+                line: JSON.stringify({ time: new Date().toISOString(), level: 'warn', scope: this.scope, msg: 'log buffer overflow', dropped }),
+                error: true
+            });
+        }
+        if (this.buffer.length === 0) {
+            return;
+        }
+
+        const entries = this.buffer;
+        this.buffer = [];
+        const out = entries.filter((entry) => !entry.error).map((entry) => `${entry.line}\n`).join('');
+        const err = entries.filter((entry) => entry.error).map((entry) => `${entry.line}\n`).join('');
+        const writable = [out && this.stdout.write(out), err && this.stderr.write(err)];
+        if (writable.includes(false)) {
+            this.waitingForDrain = true;
+            const stream = writable[0] === false ? this.stdout : this.stderr;
+            stream.once('drain', () => {
+                this.waitingForDrain = false;
+                this.scheduleFlush();
+            });
+        }
+    }
+
+    private scheduleFlush() {
+        if (this.flushScheduled || this.waitingForDrain) {
+            return;
+        }
+        this.flushScheduled = true;
+        setImmediate(() => this.flush());
+    }
+}
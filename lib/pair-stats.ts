@@ -0,0 +1,207 @@
+/**
+ * 相似对统计模块
+ *
+ * 一次遍历相似对，同时计算总体、按语言、按聚类的数量 / 最大值 / 均值 / 直方图。
+ * 复杂度为 O(pairs)，不使用 Math.max(...array) 之类的展开参数，可处理百万级相似对。
+ * 总体统计取 similarities.AVG / MAX，按语言与聚类统计取 pair.similarity，与原有各处展示的口径一致。
+ */
+
+export interface SimilarityStats {
+    /** 相似对数量 */
+    count: number;
+    /** 最高相似度 */
+    max: number;
+    /** 参与均值计算的相似度之和 */
+    sum: number;
+    /** 带有相似度数值的相似对数量 */
+    valued: number;
+    /** 平均相似度 */
+    mean: number;
+    /** [0, 1] 区间等宽直方图 */
+    histogram: number[];
+}
+
+export interface PairStats {
+    overall: SimilarityStats;
+    by_language: Record<string, SimilarityStats>;
+    by_cluster: Record<string, SimilarityStats>;
+}
+
+/**
+ * 相似度取值函数，返回 undefined 表示该相似对没有数值（只计数，不参与均值与直方图）
+ */
+export type SimilarityAccessor = (pair: any) => number | undefined;
+
+export interface PairStatsOptions {
+    /** 直方图桶数，默认 10 */
+    bins?: number;
+    /** 总体统计参与均值与直方图的相似度，默认 averageSimilarity */
+    similarity?: SimilarityAccessor;
+    /** 总体统计参与最大值计算的相似度，默认 peakSimilarity */
+    peak?: SimilarityAccessor;
+    /** 按语言 / 聚类统计参与均值与直方图的相似度，默认 pairSimilarity */
+    groupSimilarity?: SimilarityAccessor;
+    /** 按语言 / 聚类统计参与最大值计算的相似度，默认 pairSimilarity */
+    groupPeak?: SimilarityAccessor;
+    /** 聚类列表，相似对两端都属于同一聚类时计入该聚类 */
+    clusters?: any[];
+}
+
+/**
+ * 相似对的代表相似度：优先取 similarity，其次取 similarities.AVG（用于排序与聚类）
+ */
+export function defaultSimilarity(pair: any): number | undefined {
+    if (typeof pair.similarity === 'number') {
+        return pair.similarity;
+    }
+    const avg = pair.similarities?.AVG;
+    return typeof avg === 'number' ? avg : undefined;
+}
+
+/**
+ * similarities.AVG，总体平均相似度只统计带有该数值的相似对
+ */
+export function averageSimilarity(pair: any): number | undefined {
+    const avg = pair.similarities?.AVG;
+    return typeof avg === 'number' ? avg : undefined;
+}
+
+/**
+ * similarities.AVG 与 similarities.MAX 中较大者，用于总体最高相似度
+ */
+export function peakSimilarity(pair: any): number | undefined {
+    const avg = averageSimilarity(pair);
+    const max = pair.similarities?.MAX;
+    if (typeof max === 'number' && (avg === undefined || max > avg)) {
+        return max;
+    }
+    return avg;
+}
+
+/**
+ * pair.similarity，缺失时按 0 计入，用于按语言 / 聚类统计
+ */
+export function pairSimilarity(pair: any): number {
+    return pair.similarity || 0;
+}
+
+class Accumulator {
+    count = 0;
+    max = 0;
+    sum = 0;
+    valued = 0;
+    histogram: number[];
+
+    constructor(bins: number) {
+        this.histogram = new Array(bins).fill(0);
+    }
+
+    add(value: number | undefined, peak: number | undefined) {
+        this.count++;
+        if (peak !== undefined && peak > this.max) {
+            this.max = peak;
+        }
+        if (value === undefined) {
+            return;
+        }
+        this.sum += value;
+        this.valued++;
+        const bins = this.histogram.length;
+        const bin = Math.min(bins - 1, Math.max(0, Math.floor(value * bins)));
+        this.histogram[bin]++;
+    }
+
+    toStats(): SimilarityStats {
+        return {
+            count: this.count,
+            max: this.max,
+            sum: this.sum,
+            valued: this.valued,
+            mean: this.valued > 0 ? this.sum / this.valued : 0,
+            histogram: this.histogram
+        };
+    }
+}
+
+function clusterKey(cluster: any, position: number): string {
+    return String(cluster.index ?? cluster.id ?? position);
+}
+
+export function computePairStats(pairs: Iterable<any>, options: PairStatsOptions = {}): PairStats {
+    const bins = Math.max(1, options.bins || 10);
+    const similarity = options.similarity || averageSimilarity;
+    const peak = options.peak || peakSimilarity;
+    const groupSimilarity = options.groupSimilarity || pairSimilarity;
+    const groupPeak = options.groupPeak || pairSimilarity;
+
+    // 提交 -> 所属聚类
+    const memberClusters = new Map<string, string[]>();
+    (options.clusters || []).forEach((cluster, position) => {
+        const key = clusterKey(cluster, position);
+        for (const member of cluster.members || []) {
+            const name = String(member);
+            const keys = memberClusters.get(name);
+            if (keys) {
+                keys.push(key);
+            } else {
+                memberClusters.set(name, [key]);
+            }
+        }
+    });
+
+    const overall = new Accumulator(bins);
+    const byLanguage = new Map<string, Accumulator>();
+    const byCluster = new Map<string, Accumulator>();
+    const accumulatorFor = (map: Map<string, Accumulator>, key: string) => {
+        let acc = map.get(key);
+        if (!acc) {
+            acc = new Accumulator(bins);
+            map.set(key, acc);
+        }
+        return acc;
+    };
+
+    for (const pair of pairs) {
+        if (!pair) {
+            continue;
+        }
+        overall.add(similarity(pair), peak(pair));
+
+        const value = groupSimilarity(pair);
+        const top = groupPeak(pair);
+        const language1 = pair.file1_language;
+        const language2 = pair.file2_language;
+        if (language1) {
+            accumulatorFor(byLanguage, language1).add(value, top);
+        }
+        if (language2 && language2 !== language1) {
+            accumulatorFor(byLanguage, language2).add(value, top);
+        }
+
+        if (memberClusters.size > 0) {
+            const first = memberClusters.get(String(pair.first_submission));
+            const second = memberClusters.get(String(pair.second_submission));
+            if (first && second) {
+                for (const key of first) {
+                    if (second.includes(key)) {
+                        accumulatorFor(byCluster, key).add(value, top);
+                    }
+                }
+            }
+        }
+    }
+
+    const toRecord = (map: Map<string, Accumulator>) => {
+        const record: Record<string, SimilarityStats> = {};
+        for (const [key, acc] of map) {
+            record[key] = acc.toStats();
+        }
+        return record;
+    };
+
+    return {
+        overall: overall.toStats(),
+        by_language: toRecord(byLanguage),
+        by_cluster: toRecord(byCluster)
+    };
+}
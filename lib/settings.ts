@@ -0,0 +1,158 @@
+/**
+ * 插件设置模块
+ *
+ * 将 config.json 与系统设置（phosphorus.*）合并为一个带类型的设置对象。
+ * 优先级：系统设置 > config.json > 默认值。无效值（非数字、越界）回退到下一级。
+ */
+
+import { isLogLevel, LogLevel } from './logger';
+
+export interface PluginSettings {
+    api: {
+        /** Phosphorus 后端地址 */
+        base_url: string;
+        /** 单次请求超时（毫秒） */
+        timeout: number;
+        /** 5xx / 网络错误时的最大尝试次数 */
+        retry_attempts: number;
+    };
+    http: {
+        /** 每个后端地址的最大并发连接数 */
+        max_sockets: number;
+        /** keep-alive 空闲连接超时（毫秒） */
+        idle_timeout: number;
+    };
+    detection: {
+        default_min_tokens: number;
+        default_similarity_threshold: number;
+        max_concurrent_checks: number;
+    };
+    compression: {
+        /** 小于该字节数的响应不压缩 */
+        threshold: number;
+    };
+    log: {
+        level: LogLevel;
+        payloads: boolean;
+        sample_rate: number;
+        max_payload: number;
+    };
+}
+
+export const DEFAULT_SETTINGS: PluginSettings = {
+    api: {
+        base_url: 'http://localhost:8000',
+        timeout: 300000,
+        retry_attempts: 3
+    },
+    http: {
+        max_sockets: 16,
+        idle_timeout: 30000
+    },
+    detection: {
+        default_min_tokens: 9,
+        default_similarity_threshold: 0.7,
+        max_concurrent_checks: 3
+    },
+    compression: {
+        threshold: 1024
+    },
+    log: {
+        level: 'info',
+        payloads: false,
+        sample_rate: 1,
+        max_payload: 2048
+    }
+};
+
+/** 设置项对应的系统设置键，未列出的设置项只能通过 config.json 配置 */
+export const SYSTEM_SETTING_KEYS = {
+    'api.base_url': 'phosphorus.api.base',
+    'api.timeout': 'phosphorus.api.timeout',
+    'api.retry_attempts': 'phosphorus.api.retry_attempts',
+    'http.max_sockets': 'phosphorus.http.max_sockets',
+    'http.idle_timeout': 'phosphorus.http.idle_timeout',
+    'detection.default_min_tokens': 'phosphorus.detection.default_min_tokens',
+    'detection.default_similarity_threshold': 'phosphorus.detection.default_similarity_threshold',
+    'detection.max_concurrent_checks': 'phosphorus.detection.max_concurrent_checks',
+    'compression.threshold': 'phosphorus.compression.threshold',
+    'log.level': 'phosphorus.log.level',
+    'log.payloads': 'phosphorus.log.payloads',
+    'log.sample_rate': 'phosphorus.log.sample_rate',
+    'log.max_payload': 'phosphorus.log.max_payload'
+} as const;
+
+function pickNumber(min: number, max: number, ...candidates: any[]): number {
+    for (const candidate of candidates) {
+        if (candidate === undefined || candidate === null || candidate === '') {
+            continue;
+        }
+        const value = +candidate;
+        if (Number.isFinite(value) && value >= min && value <= max) {
+            return value;
+        }
+    }
+    return NaN;
+}
+
+function pickString(...candidates: any[]): string {
+    return candidates.find((candidate) => typeof candidate === 'string' && candidate.trim() !== '')?.trim();
+}
+
+function pickBoolean(...candidates: any[]): boolean {
+    for (const candidate of candidates) {
+        if (typeof candidate === 'boolean') {
+            return candidate;
+        }
+        if (candidate === 'true' || candidate === '1' || candidate === 1) {
+            return true;
+        }
+        if (candidate === 'false' || candidate === '0' || candidate === 0) {
+            return false;
+        }
+    }
+    return false;
+}
+
+/**
+ * 合并 config.json 内容与系统设置，返回完整的设置对象
+ *
+ * @param fileConfig config.json 解析结果（可为空）
+ * @param getSystemSetting 读取系统设置的函数，如 key => SystemModel.get(key)
+ */
+export function loadSettings(fileConfig: any, getSystemSetting: (key: string) => any): PluginSettings {
+    const file = fileConfig || {};
+    const system = (name: keyof typeof SYSTEM_SETTING_KEYS) => getSystemSetting(SYSTEM_SETTING_KEYS[name]);
+    const defaults = DEFAULT_SETTINGS;
+    const level = [system('log.level'), file.log?.level].find(isLogLevel);
+
+    return {
+        api: {
+            base_url: pickString(system('api.base_url'), file.api?.base_url, defaults.api.base_url).replace(/\/+$/, ''),
+            timeout: pickNumber(1000, 3600000, system('api.timeout'), file.api?.timeout, defaults.api.timeout),
+            retry_attempts: pickNumber(1, 10, system('api.retry_attempts'), file.api?.retry_attempts, defaults.api.retry_attempts)
+        },
+        http: {
+            max_sockets: pickNumber(1, 1024, system('http.max_sockets'), file.http?.max_sockets, defaults.http.max_sockets),
+            idle_timeout: pickNumber(1000, 600000, system('http.idle_timeout'), file.http?.idle_timeout, defaults.http.idle_timeout)
+        },
+        detection: {
+            default_min_tokens: pickNumber(1, 1000,
+                system('detection.default_min_tokens'), file.detection?.default_min_tokens, defaults.detection.default_min_tokens),
+            default_similarity_threshold: pickNumber(0, 1,
+                system('detection.default_similarity_threshold'), file.detection?.default_similarity_threshold,
+                defaults.detection.default_similarity_threshold),
+            max_concurrent_checks: pickNumber(1, 64,
+                system('detection.max_concurrent_checks'), file.detection?.max_concurrent_checks, defaults.detection.max_concurrent_checks)
+        },
+        compression: {
+            threshold: pickNumber(0, 1 << 30, system('compression.threshold'), file.compression?.threshold, defaults.compression.threshold)
+        },
+        log: {
+            level: level || defaults.log.level,
+            payloads: pickBoolean(system('log.payloads'), file.log?.payloads, defaults.log.payloads),
+            sample_rate: pickNumber(Number.MIN_VALUE, 1, system('log.sample_rate'), file.log?.sample_rate, defaults.log.sample_rate),
+            max_payload: pickNumber(64, 1 << 20, system('log.max_payload'), file.log?.max_payload, defaults.log.max_payload)
+        }
+    };
+}
@@ -127,49 +127,55 @@ function addPlagiarismButtonToSidebar(contestId) {
 
 /**
  * 实时检测状态更新
+ *
+ * 通过 /plagiarism/api/task/:task_id/events 的 Server-Sent Events 接收任务进度推送，
+ * 不再定时轮询。未提供回调时，任务完成后刷新页面。
  */
 class PlagiarismStatusUpdater {
-    constructor(contestId) {
-        this.contestId = contestId;
+    constructor(taskId, handlers = {}) {
+        this.taskId = taskId;
+        this.handlers = handlers;
         this.isRunning = false;
-        this.intervalId = null;
+        this.eventSource = null;
     }
     
     start() {
-        if (this.isRunning) return;
+        if (this.isRunning || !('EventSource' in window)) return;
         
         this.isRunning = true;
-        this.intervalId = setInterval(() => {
-            this.checkStatus();
-        }, 5000); // 每5秒检查一次
+        this.eventSource = new EventSource(`/plagiarism/api/task/${encodeURIComponent(this.taskId)}/events`);
+        this.eventSource.addEventListener('progress', (event) => {
+            if (this.handlers.onProgress) {
+                this.handlers.onProgress(JSON.parse(event.data));
+            }
+        });
+        this.eventSource.addEventListener('complete', (event) => {
+            this.stop();
+            if (this.handlers.onComplete) {
+                this.handlers.onComplete(JSON.parse(event.data));
+            } else {
+                window.location.reload();
+            }
+        });
+        this.eventSource.addEventListener('failed', (event) => {
+            this.stop();
+            if (this.handlers.onFailed) {
+                this.handlers.onFailed(JSON.parse(event.data));
+            }
+        });
+        // 连接断开时浏览器会自动重连
+        this.eventSource.addEventListener('error', () => {
+            console.log('任务进度连接中断，正在重连');
+        });
     }
     
     stop() {
-        if (this.intervalId) {
-            clearInterval(this.intervalId);
-            this.intervalId = null;
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
         }
         this.isRunning = false;
     }
-    
-    async checkStatus() {
-        try {
-            const response = await fetch(`/contest/${this.contestId}/plagiarism`, {
-                method: 'GET',
-                headers: {
-                    'Accept': 'application/json'
-                }
-            });
-            
-            if (response.ok) {
-                // 如果检测完成，停止轮询并刷新页面
-                this.stop();
-                window.location.reload();
-            }
-        } catch (error) {
-            console.log('检查状态失败:', error);
-        }
-    }
 }
 
 // 导出供其他脚本使用
@@ -0,0 +1,80 @@
+/**
+ * 响应压缩测试：npm test（node:test，经 tsx 加载 TypeScript）
+ */
+
+import assert from 'node:assert/strict';
+import { describe, it } from 'node:test';
+import {
+    ASYNC_COMPRESS_THRESHOLD, compressBuffer, decodeBody, isCompressibleType, negotiateEncoding
+} from '../lib/compression';
+
+describe('negotiateEncoding', () => {
+    it('returns null without a usable encoding', () => {
+        assert.equal(negotiateEncoding(undefined), null);
+        assert.equal(negotiateEncoding(''), null);
+        assert.equal(negotiateEncoding('identity'), null);
+        assert.equal(negotiateEncoding('compress, zstd'), null);
+    });
+
+    it('prefers br, then gzip, then deflate at equal weight', () => {
+        assert.equal(negotiateEncoding('gzip, deflate, br'), 'br');
+        assert.equal(negotiateEncoding('deflate, gzip'), 'gzip');
+        assert.equal(negotiateEncoding(['deflate', 'gzip']), 'gzip');
+    });
+
+    it('follows q-values', () => {
+        assert.equal(negotiateEncoding('br;q=0.5, gzip;q=0.8'), 'gzip');
+        assert.equal(negotiateEncoding('gzip; q=0.2, deflate; q=0.9'), 'deflate');
+        assert.equal(negotiateEncoding('br;q=0, gzip;q=0'), null);
+        assert.equal(negotiateEncoding('gzip;q=abc'), null);
+    });
+
+    it('applies * to encodings that are not listed', () => {
+        assert.equal(negotiateEncoding('*'), 'br');
+        assert.equal(negotiateEncoding('br;q=0, *'), 'gzip');
+        assert.equal(negotiateEncoding('*;q=0'), null);
+    });
+
+    it('ignores identity;q=0', () => {
+        assert.equal(negotiateEncoding('identity;q=0, gzip'), 'gzip');
+        assert.equal(negotiateEncoding('identity;q=0'), null);
+    });
+});
+
+describe('isCompressibleType', () => {
+    it('accepts text and JSON-like types', () => {
+        for (const type of ['text/html; charset=utf-8', 'application/json', 'application/x-ndjson', 'application/problem+json', 'text/csv']) {
+            assert.equal(isCompressibleType(type), true, type);
+        }
+    });
+
+    it('rejects event streams, binaries and missing types', () => {
+        for (const type of ['text/event-stream', 'image/png', 'application/octet-stream', '', undefined]) {
+            assert.equal(isCompressibleType(type), false, String(type));
+        }
+    });
+});
+
+describe('decodeBody', () => {
+    const text = Buffer.from('{"pairs":[]}'.repeat(200));
+
+    for (const encoding of ['br', 'gzip', 'deflate'] as const) {
+        it(`round-trips ${encoding}`, async () => {
+            const encoded = await compressBuffer(text, encoding);
+            assert.ok(encoded.length < text.length);
+            assert.deepEqual(await decodeBody(encoded, encoding), text);
+        });
+    }
+
+    it('round-trips bodies large enough for async compression', async () => {
+        const large = Buffer.alloc(ASYNC_COMPRESS_THRESHOLD * 2, 'a');
+        assert.deepEqual(await decodeBody(await compressBuffer(large, 'gzip'), ' GZIP '), large);
+        assert.deepEqual(await decodeBody(await compressBuffer(large, 'br'), 'br'), large);
+    });
+
+    it('returns the body unchanged for identity or unknown encodings', async () => {
+        assert.equal(await decodeBody(text, undefined), text);
+        assert.equal(await decodeBody(text, 'identity'), text);
+        assert.equal(await decodeBody(text, 'zstd'), text);
+    });
+});
@@ -0,0 +1,115 @@
+/**
+ * 增量合并测试：npm test（node:test，经 tsx 加载 TypeScript）
+ */
+
+import assert from 'node:assert/strict';
+import { describe, it } from 'node:test';
+import {
+    buildClusters, mergePairs, mergeResultStats, pairMembers, rejudgedLanguages, submissionKeys
+} from '../lib/incremental';
+
+describe('submissionKeys', () => {
+    it('maps records to record ids and submitter uids', () => {
+        const records = [
+            { _id: { toHexString: () => '65f000000000000000000001' }, uid: 1001 },
+            { _id: '65f000000000000000000002', uid: 1001 }
+        ];
+        assert.deepEqual(submissionKeys(records).sort(), ['1001', '65f000000000000000000001', '65f000000000000000000002']);
+    });
+});
+
+describe('mergePairs', () => {
+    const base = [
+        { first_submission: 'alice', second_submission: 'bob', similarity: 0.9 },
+        { first_submission: 'carol', second_submission: 'dave', similarity: 0.8 }
+    ];
+
+    it('drops base pairs whose user-keyed submissions changed', () => {
+        const delta = [{ first_submission: 'bob', second_submission: 'dave', similarity: 0.75 }];
+        const merged = mergePairs(base, delta, ['65f000000000000000000003', 'bob']);
+        assert.deepEqual(merged.map(pairMembers), [['carol', 'dave'], ['bob', 'dave']]);
+    });
+
+    it('matches changed uids against user id fields', () => {
+        const pairs = [
+            { first_submission: { file_count: 1 }, second_submission: { file_count: 1 }, first_user_id: 7, second_user_id: 8, similarity: 0.9 },
+            { first_submission: { file_count: 1 }, second_submission: { file_count: 1 }, first_user_id: 9, second_user_id: 10, similarity: 0.8 }
+        ];
+        const merged = mergePairs(pairs, [], submissionKeys([{ _id: '65f000000000000000000004', uid: 8 }]));
+        assert.deepEqual(merged.map(pairMembers), [['9', '10']]);
+    });
+
+    it('prefers delta pairs for the same submissions', () => {
+        const delta = [{ first_submission: 'bob', second_submission: 'alice', similarity: 0.5 }];
+        const merged = mergePairs(base, delta, []);
+        assert.equal(merged.length, 2);
+        assert.equal(merged.find((pair) => pair.first_submission === 'bob')?.similarity, 0.5);
+    });
+});
+
+describe('rejudgedLanguages', () => {
+    const record = (id: string, submittedAt: string, lang: string) => ({
+        _id: { toHexString: () => id, getTimestamp: () => new Date(submittedAt) },
+        lang
+    });
+    const snapshotAt = new Date('2024-05-01T10:00:00Z');
+
+    it('counts only records the base analysis had already seen', () => {
+        const records = [
+            record('rejudged', '2024-05-01T09:00:00Z', 'cc.cc17'),
+            record('pending', '2024-05-01T09:59:00Z', 'py.py3'),
+            record('new', '2024-05-01T10:05:00Z', 'java')
+        ];
+        assert.deepEqual(rejudgedLanguages(records, snapshotAt, ['pending']), ['cc.cc17']);
+    });
+
+    it('does not subtract submissions that were pending at snapshot time', () => {
+        const records = [record('pending', '2024-05-01T09:59:00Z', 'cc.cc17')];
+        const rejudged = rejudgedLanguages(records, snapshotAt, ['pending']);
+        const stats = mergeResultStats(
+            { total_submissions: 4, submission_stats: { total_submissions: 4, by_language: { cc: { count: 4 } } } },
+            { total_submissions: 1, submission_stats: { total_submissions: 1, by_language: { cc: { count: 1 } } } },
+            ['pending'],
+            rejudged
+        );
+        assert.equal(stats.total_submissions, 5);
+        assert.equal(stats.submission_stats.by_language.cc.count, 5);
+    });
+});
+
+describe('mergeResultStats', () => {
+    it('adds counts from the base result and drops rejudged duplicates', () => {
+        const base = {
+            total_submissions: 10,
+            total_comparisons: 45,
+            submission_stats: { total_submissions: 10, by_language: { cc: { count: 8 }, py: { count: 2 } } },
+            failed_submissions: [{ submission_id: 'alice', reason: 'parse' }, { submission_id: 'bob', reason: 'parse' }]
+        };
+        const delta = {
+            total_submissions: 3,
+            total_comparisons: 30,
+            submission_stats: { total_submissions: 3, by_language: { cc: { count: 2 }, java: { count: 1 } } },
+            failed_submissions: [{ submission_id: 'erin', reason: 'parse' }]
+        };
+        const stats = mergeResultStats(base, delta, ['bob'], ['cc.cc17']);
+        assert.equal(stats.total_submissions, 12);
+        assert.equal(stats.total_comparisons, 75);
+        assert.deepEqual(stats.submission_stats, {
+            total_submissions: 12,
+            by_language: { cc: { count: 9 }, py: { count: 2 }, java: { count: 1 } }
+        });
+        assert.deepEqual(stats.failed_submissions.map((entry) => entry.submission_id), ['alice', 'erin']);
+    });
+});
+
+describe('buildClusters', () => {
+    it('groups pairs at or above the threshold', () => {
+        const clusters = buildClusters([
+            { first_submission: 'a', second_submission: 'b', similarity: 0.9 },
+            { first_submission: 'b', second_submission: 'c', similarity: 0.8 },
+            { first_submission: 'd', second_submission: 'e', similarity: 0.4 }
+        ], 0.7);
+        assert.equal(clusters.length, 1);
+        assert.deepEqual([...clusters[0].members].sort(), ['a', 'b', 'c']);
+    });
+});
@@ -0,0 +1,96 @@
+/**
+ * 相似对统计测试：npm test（node:test，经 tsx 加载 TypeScript）
+ */
+
+import assert from 'node:assert/strict';
+import { describe, it } from 'node:test';
+import {
+    averageSimilarity, computePairStats, defaultSimilarity, pairSimilarity, peakSimilarity
+} from '../lib/pair-stats';
+
+describe('similarity accessors', () => {
+    it('averageSimilarity reads similarities.AVG only', () => {
+        assert.equal(averageSimilarity({ similarity: 0.9, similarities: { AVG: 0.4 } }), 0.4);
+        assert.equal(averageSimilarity({ similarity: 0.9 }), undefined);
+    });
+
+    it('peakSimilarity takes the larger of AVG and MAX', () => {
+        assert.equal(peakSimilarity({ similarities: { AVG: 0.4, MAX: 0.7 } }), 0.7);
+        assert.equal(peakSimilarity({ similarities: { AVG: 0.6, MAX: 0.5 } }), 0.6);
+        assert.equal(peakSimilarity({ similarities: { MAX: 0.5 } }), 0.5);
+        assert.equal(peakSimilarity({ similarity: 0.9 }), undefined);
+    });
+
+    it('pairSimilarity reads similarity and treats a missing value as 0', () => {
+        assert.equal(pairSimilarity({ similarity: 0.8, similarities: { AVG: 0.4 } }), 0.8);
+        assert.equal(pairSimilarity({ similarities: { AVG: 0.4 } }), 0);
+    });
+
+    it('defaultSimilarity prefers similarity and falls back to AVG', () => {
+        assert.equal(defaultSimilarity({ similarity: 0.8, similarities: { AVG: 0.4 } }), 0.8);
+        assert.equal(defaultSimilarity({ similarities: { AVG: 0.4 } }), 0.4);
+        assert.equal(defaultSimilarity({}), undefined);
+    });
+});
+
+describe('computePairStats', () => {
+    it('returns zeroed stats for no pairs', () => {
+        const stats = computePairStats([]);
+        assert.deepEqual(stats.overall, { count: 0, max: 0, sum: 0, valued: 0, mean: 0, histogram: new Array(10).fill(0) });
+        assert.deepEqual(stats.by_language, {});
+        assert.deepEqual(stats.by_cluster, {});
+    });
+
+    it('skips empty entries', () => {
+        assert.equal(computePairStats([null, undefined]).overall.count, 0);
+    });
+
+    const pairs = [
+        {
+            first_submission: 'a', second_submission: 'b', file1_language: 'cpp', file2_language: 'cpp',
+            similarity: 0.9, similarities: { AVG: 0.5, MAX: 0.95 }
+        },
+        {
+            first_submission: 'b', second_submission: 'c', file1_language: 'cpp', file2_language: 'python',
+            similarities: { AVG: 0.3, MAX: 0.35 }
+        },
+        {
+            first_submission: 'c', second_submission: 'd', file1_language: 'python', file2_language: 'python',
+            similarity: 0.6
+        }
+    ];
+    const clusters = [{ index: 0, members: ['a', 'b'] }, { index: 1, members: ['b', 'c', 'd'] }];
+
+    it('uses AVG for the overall mean and max(AVG, MAX) for the overall peak', () => {
+        const { overall } = computePairStats(pairs, { clusters });
+        assert.equal(overall.count, 3);
+        // 第三个相似对没有 AVG：只计数，不参与均值与直方图
+        assert.equal(overall.valued, 2);
+        assert.equal(overall.mean, 0.4);
+        assert.equal(overall.max, 0.95);
+        assert.equal(overall.histogram.reduce((sum, bin) => sum + bin, 0), 2);
+    });
+
+    it('uses pair.similarity (missing as 0) for languages and clusters', () => {
+        const stats = computePairStats(pairs, { clusters });
+        assert.deepEqual(
+            { count: stats.by_language.cpp.count, max: stats.by_language.cpp.max, mean: stats.by_language.cpp.mean },
+            { count: 2, max: 0.9, mean: 0.45 }
+        );
+        assert.deepEqual(
+            { count: stats.by_language.python.count, max: stats.by_language.python.max, mean: stats.by_language.python.mean },
+            { count: 2, max: 0.6, mean: 0.3 }
+        );
+        assert.equal(stats.by_cluster['0'].count, 1);
+        assert.equal(stats.by_cluster['0'].max, 0.9);
+        assert.equal(stats.by_cluster['1'].count, 2);
+        assert.equal(stats.by_cluster['1'].mean, 0.3);
+    });
+
+    it('honours custom accessors and bin counts', () => {
+        const { overall } = computePairStats(pairs, { similarity: defaultSimilarity, peak: defaultSimilarity, bins: 2 });
+        assert.equal(overall.valued, 3);
+        assert.equal(overall.max, 0.9);
+        assert.deepEqual(overall.histogram, [1, 2]);
+    });
+});
@@ -0,0 +1,75 @@
+/**
+ * 插件设置测试：npm test（node:test，经 tsx 加载 TypeScript）
+ */
+
+import assert from 'node:assert/strict';
+import fs from 'node:fs';
+import path from 'node:path';
+import { describe, it } from 'node:test';
+import { DEFAULT_SETTINGS, loadSettings, SYSTEM_SETTING_KEYS } from '../lib/settings';
+
+const noSystemSettings = () => undefined;
+
+describe('loadSettings', () => {
+    it('returns the defaults without config.json or system settings', () => {
+        assert.deepEqual(loadSettings(null, noSystemSettings), DEFAULT_SETTINGS);
+    });
+
+    it('keeps the default similarity threshold when loading the shipped config.json', () => {
+        const file = JSON.parse(fs.readFileSync(path.join(__dirname, '..', 'config.json'), 'utf8'));
+        const settings = loadSettings(file, noSystemSettings);
+        assert.equal(settings.detection.default_similarity_threshold, DEFAULT_SETTINGS.detection.default_similarity_threshold);
+        assert.equal(settings.detection.default_min_tokens, DEFAULT_SETTINGS.detection.default_min_tokens);
+    });
+
+    it('prefers system settings over config.json over defaults', () => {
+        const system: Record<string, any> = {
+            [SYSTEM_SETTING_KEYS['api.timeout']]: '60000',
+            [SYSTEM_SETTING_KEYS['log.level']]: 'debug'
+        };
+        const settings = loadSettings(
+            { api: { timeout: 120000, retry_attempts: 5 }, log: { level: 'warn' } },
+            (key) => system[key]
+        );
+        assert.equal(settings.api.timeout, 60000);
+        assert.equal(settings.api.retry_attempts, 5);
+        assert.equal(settings.api.base_url, DEFAULT_SETTINGS.api.base_url);
+        assert.equal(settings.log.level, 'debug');
+    });
+
+    it('falls back to the next source for out-of-range or invalid numbers', () => {
+        const system: Record<string, any> = {
+            [SYSTEM_SETTING_KEYS['detection.default_similarity_threshold']]: '1.5',
+            [SYSTEM_SETTING_KEYS['http.max_sockets']]: 'many'
+        };
+        const settings = loadSettings(
+            { detection: { default_similarity_threshold: 0.5 }, http: { max_sockets: 0 }, api: { retry_attempts: 11 } },
+            (key) => system[key]
+        );
+        assert.equal(settings.detection.default_similarity_threshold, 0.5);
+        assert.equal(settings.http.max_sockets, DEFAULT_SETTINGS.http.max_sockets);
+        assert.equal(settings.api.retry_attempts, DEFAULT_SETTINGS.api.retry_attempts);
+    });
+
+    it('accepts values on the range boundaries and skips empty strings', () => {
+        const settings = loadSettings(
+            { api: { timeout: 1000, retry_attempts: 10 } },
+            (key) => (key === SYSTEM_SETTING_KEYS['api.timeout'] ? '' : undefined)
+        );
+        assert.equal(settings.api.timeout, 1000);
+        assert.equal(settings.api.retry_attempts, 10);
+    });
+
+    it('parses booleans and strips trailing slashes from the base URL', () => {
+        const settings = loadSettings(
+            { api: { base_url: ' http://phosphorus:8000// ' }, log: { payloads: 'true' } },
+            (key) => (key === SYSTEM_SETTING_KEYS['log.payloads'] ? 'false' : undefined)
+        );
+        assert.equal(settings.api.base_url, 'http://phosphorus:8000');
+        assert.equal(settings.log.payloads, false);
+    });
+
+    it('ignores unknown log levels', () => {
+        assert.equal(loadSettings({ log: { level: 'verbose' } }, noSystemSettings).log.level, DEFAULT_SETTINGS.log.level);
+    });
+});